@@ -0,0 +1,85 @@
+# secondhand_market/admin.py
+"""
+Hidden database diagnostics view.
+
+Not a file under pages/ so it never appears in the sidebar. The home page
+renders it instead of the normal content when opened as
+/?admin=<ADMIN_KEY>, with ADMIN_KEY set in the environment. Without
+ADMIN_KEY the view is disabled.
+
+Stats are per Streamlit server process, covering every session it serves.
+"""
+
+import os
+import streamlit as st
+from database.query_stats import (
+    SLOW_QUERY_MS, get_query_stats, get_query_totals, get_slow_queries, reset_query_stats
+)
+from database.connection_pool import get_pool_stats
+from database.transaction_manager import get_retry_stats
+
+ADMIN_KEY = os.environ.get('ADMIN_KEY')
+
+# Orderings offered for the top statements table
+ORDER_BY_OPTIONS = {
+    "Total time": "total_ms",
+    "Average time": "avg_ms",
+    "Max time": "max_ms",
+    "Calls": "calls",
+    "Rows": "rows",
+    "Bytes received": "bytes_received",
+    "Slow calls": "slow_calls",
+}
+
+def admin_requested():
+    """True if the current request carries the admin key."""
+    return bool(ADMIN_KEY) and st.query_params.get("admin") == ADMIN_KEY
+
+def admin_page():
+    """Show query statistics, slow queries, pool and retry counters."""
+    import pandas as pd
+
+    st.title("🛠️ Database Diagnostics")
+
+    totals = get_query_totals()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Statements", totals["statements"])
+    col2.metric("Executions", totals["calls"])
+    col3.metric(f"Slow (≥ {SLOW_QUERY_MS:.0f} ms)", totals["slow_calls"])
+    col4.metric("Total DB time", f"{totals['total_ms'] / 1000:.1f} s")
+    if totals["dropped"]:
+        st.warning(f"{totals['dropped']} executions of untracked statements (DB_QUERY_STATS_MAX reached)")
+
+    st.subheader("Top Statements")
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        order_label = st.selectbox("Order by", list(ORDER_BY_OPTIONS))
+    with col2:
+        top = st.number_input("Show", min_value=5, max_value=200, value=20, step=5)
+    stats = get_query_stats(top=int(top), order_by=ORDER_BY_OPTIONS[order_label])
+    if stats:
+        st.dataframe(pd.DataFrame(stats)[[
+            "statement", "call_site", "calls", "total_ms", "avg_ms", "max_ms",
+            "rows", "bytes_sent", "bytes_received", "slow_calls",
+        ]], use_container_width=True)
+    else:
+        st.info("No statements recorded yet.")
+
+    st.subheader("Recent Slow Queries")
+    slow_queries = get_slow_queries()
+    if slow_queries:
+        st.dataframe(pd.DataFrame(slow_queries), use_container_width=True)
+    else:
+        st.info("No slow queries recorded.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Connection Pool")
+        st.json(get_pool_stats())
+    with col2:
+        st.subheader("Transaction Retries")
+        st.json(get_retry_stats())
+
+    if st.button("Reset query statistics"):
+        reset_query_stats()
+        st.rerun()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+benchmark_concurrency.py - Concurrency benchmark for the purchase path
+
+Drives concurrent buyers at transaction_manager.purchase_item() and
+update_item_status_safely() against the configured MySQL database and
+reports, per workload, executor, concurrency mode and isolation level:
+throughput, p50/p95/p99 latency, deadlock and lock wait timeout retries,
+and consistency violations.
+
+Usage:
+    python benchmark_concurrency.py
+    python benchmark_concurrency.py --buyers 32 --items 2 --rounds 20
+    python benchmark_concurrency.py --workload purchase --executor process \\
+        --isolation READ_COMMITTED SERIALIZABLE
+
+Each round resets the hot items to 'Available' and releases every buyer at
+the same moment; each buyer works on a random hot item. Buyers run either as
+threads of this process (sharing its connection pool) or in a pool of
+processes (one connection pool each). The isolation level only applies to
+the pessimistic mode; optimistic updates always run under READ COMMITTED.
+
+Violations:
+    purchase  More than one successful purchase of the same item in a round
+              (a double sell)
+    status    An item that a successful call set to 'Sold' but that ends the
+              round with another status. Sold items must stay sold, so
+              some writer overwrote the sale based on a stale read of
+              the status (a lost update)
+
+Run with DB_POOL_SIZE/DB_POOL_MAX_OVERFLOW large enough for --buyers threads,
+otherwise buyers also queue for pool connections. The benchmark items are
+created before the run and deleted afterwards.
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from database.cache import ITEMS, invalidate
+from database.db_setup import get_connection
+from database.transaction_manager import (
+    ConcurrencyMode, IsolationLevel, purchase_item, update_item_status_safely, get_retry_stats
+)
+
+BENCHMARK_TITLE = "[benchmark] contention item"
+
+WORKLOADS = ("purchase", "status")
+EXECUTORS = ("thread", "process")
+ISOLATION_LEVELS = ("READ_UNCOMMITTED", "READ_COMMITTED", "REPEATABLE_READ", "SERIALIZABLE")
+
+# Statuses picked at random by the status workload
+STATUS_CHOICES = ("Available", "Pending", "Sold")
+
+# Seconds between submitting a round and releasing its buyers, so every
+# buyer is waiting at the start line (process buyers need longer)
+START_DELAY = {"thread": 0.1, "process": 0.5}
+
+def create_hot_items(count):
+    """Insert count available benchmark items and return their IDs."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    item_ids = []
+    for n in range(count):
+        cursor.execute(
+            "INSERT INTO items (title, price, condition_status, status, seller_id) VALUES (%s, %s, %s, %s, %s)",
+            (f"{BENCHMARK_TITLE} {n + 1}", 10.00, "New", "Available", 1)
+        )
+        item_ids.append(cursor.lastrowid)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return item_ids
+
+def reset_hot_items(item_ids):
+    """Make every benchmark item available again."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    cursor.execute(
+        f"UPDATE items SET status = 'Available', version = version + 1 WHERE item_id IN ({placeholders})",
+        item_ids
+    )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def current_statuses(item_ids):
+    """Return item_id -> status for the given items, on a fresh connection."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(item_ids))
+        cursor.execute(f"SELECT item_id, status FROM items WHERE item_id IN ({placeholders})", item_ids)
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+def delete_hot_items(item_ids):
+    """Remove the benchmark items."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    cursor.execute(f"DELETE FROM items WHERE item_id IN ({placeholders})", item_ids)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    invalidate(ITEMS)
+
+def _warm_up(_):
+    """Process pool task that only makes sure the worker has started and imported everything."""
+    return None
+
+def _retry_snapshot():
+    stats = get_retry_stats()
+    return Counter({k: v for k, v in stats.items() if k.startswith("retries_") or k == "exhausted"})
+
+def run_buyer(workload, mode, isolation_level, item_ids, buyer_id, start_at):
+    """
+    One buyer: wait for the start time, then make a single call.
+
+    Module-level so that process pool workers can run it.
+
+    Returns:
+        tuple: (item_id, status written by the status workload or None,
+        outcome, latency seconds, finished wall time, retry counter delta)
+    """
+    item_id = random.choice(item_ids)
+    new_status = random.choice(STATUS_CHOICES) if workload == "status" else None
+    retries_before = _retry_snapshot()
+    time.sleep(max(0.0, start_at - time.time()))
+
+    started = time.perf_counter()
+    try:
+        if workload == "purchase":
+            ok = purchase_item(item_id, buyer_id, isolation_level=isolation_level, mode=mode)
+        else:
+            ok = update_item_status_safely(item_id, new_status, isolation_level=isolation_level, mode=mode)
+        outcome = "ok" if ok else "rejected"
+    except Exception:
+        outcome = "errors"
+    latency = time.perf_counter() - started
+
+    return item_id, new_status, outcome, latency, time.time(), _retry_snapshot() - retries_before
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def run_scenario(executor, executor_kind, workload, mode, isolation_level, item_ids, buyers, rounds):
+    """
+    Run every round of one scenario on an already started executor.
+
+    Returns:
+        dict: Outcome counts, retry counts, violations, throughput and latency percentiles
+    """
+    outcomes = Counter()
+    retries = Counter()
+    latencies = []
+    violations = 0
+    total_elapsed = 0.0
+
+    for _ in range(rounds):
+        reset_hot_items(item_ids)
+        retries_before = _retry_snapshot()
+        start_at = time.time() + START_DELAY[executor_kind]
+        futures = [
+            executor.submit(run_buyer, workload, mode, isolation_level, item_ids, buyer_id, start_at)
+            for buyer_id in range(1, buyers + 1)
+        ]
+        results = [future.result() for future in futures]
+        total_elapsed += max(result[4] for result in results) - start_at
+
+        successes = Counter()
+        sold = set()
+        for item_id, new_status, outcome, latency, _, retry_delta in results:
+            outcomes[outcome] += 1
+            latencies.append(latency)
+            if executor_kind == "process":
+                retries.update(retry_delta)
+            if outcome == "ok":
+                successes[item_id] += 1
+                if new_status == "Sold":
+                    sold.add(item_id)
+
+        # Thread buyers share this process's retry counters, so per-call
+        # deltas overlap; take the delta over the whole round instead
+        if executor_kind == "thread":
+            retries.update(_retry_snapshot() - retries_before)
+
+        if workload == "purchase":
+            violations += sum(count - 1 for count in successes.values() if count > 1)
+        else:
+            statuses_after = current_statuses(item_ids)
+            violations += sum(1 for item_id in sold if statuses_after[item_id] != "Sold")
+
+    invalidate(ITEMS)
+    calls = buyers * rounds
+    return {
+        "workload": workload,
+        "executor": executor_kind,
+        "mode": mode,
+        "isolation": isolation_level if mode == ConcurrencyMode.PESSIMISTIC else "-",
+        "calls": calls,
+        "ok": outcomes["ok"],
+        "rejected": outcomes["rejected"],
+        "errors": outcomes["errors"],
+        "deadlocks": retries["retries_deadlock"],
+        "timeouts": retries["retries_lock_wait_timeout"],
+        "exhausted": retries["exhausted"],
+        "violations": violations,
+        "throughput": calls / total_elapsed if total_elapsed > 0 else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+    }
+
+def make_executor(executor_kind, buyers):
+    """Start a thread or process pool with one worker per buyer."""
+    if executor_kind == "thread":
+        return ThreadPoolExecutor(max_workers=buyers)
+    # spawn rather than fork: each worker builds its own connection pool
+    # instead of inheriting the parent's sockets
+    executor = ProcessPoolExecutor(max_workers=buyers, mp_context=multiprocessing.get_context("spawn"))
+    list(executor.map(_warm_up, range(buyers)))
+    return executor
+
+def scenarios(modes, isolation_levels):
+    """Yield (mode, isolation level) pairs; optimistic mode ignores the isolation level."""
+    for mode in modes:
+        if mode == ConcurrencyMode.PESSIMISTIC:
+            for name in isolation_levels:
+                yield mode, getattr(IsolationLevel, name)
+        else:
+            yield mode, IsolationLevel.READ_COMMITTED
+
+COLUMNS = [
+    ("Workload", "workload", "<9"), ("Exec", "executor", "<8"), ("Mode", "mode", "<12"),
+    ("Isolation", "isolation", "<17"), ("Calls", "calls", ">6"), ("OK", "ok", ">5"),
+    ("Rejected", "rejected", ">8"), ("Errors", "errors", ">6"), ("Deadlk", "deadlocks", ">6"),
+    ("Timeout", "timeouts", ">7"), ("Exhaust", "exhausted", ">7"), ("Viol", "violations", ">5"),
+    ("Tx/s", "throughput", ">8.1f"), ("p50 ms", "p50_ms", ">8.1f"), ("p95 ms", "p95_ms", ">8.1f"),
+    ("p99 ms", "p99_ms", ">8.1f"),
+]
+
+def print_header():
+    print(" ".join(f"{title:{spec.split('.')[0]}}" for title, _, spec in COLUMNS))
+
+def print_row(result):
+    print(" ".join(f"{result[key]:{spec}}" for _, key, spec in COLUMNS))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent purchases and status updates")
+    parser.add_argument("--buyers", type=int, default=16, help="Concurrent buyers per round")
+    parser.add_argument("--items", type=int, default=4, help="Number of hot items the buyers compete for")
+    parser.add_argument("--rounds", type=int, default=10, help="Number of rounds per scenario")
+    parser.add_argument("--workload", choices=WORKLOADS + ("all",), default="all",
+                        help="Function under test (default: both)")
+    parser.add_argument("--executor", choices=EXECUTORS + ("all",), default="all",
+                        help="Run buyers as threads, processes or both (default: both)")
+    parser.add_argument("--mode", choices=(ConcurrencyMode.PESSIMISTIC, ConcurrencyMode.OPTIMISTIC, "all"),
+                        default="all", help="Concurrency mode (default: both)")
+    parser.add_argument("--isolation", nargs="+", choices=ISOLATION_LEVELS, default=list(ISOLATION_LEVELS),
+                        help="Isolation levels for the pessimistic mode (default: all)")
+    args = parser.parse_args()
+
+    workloads = WORKLOADS if args.workload == "all" else (args.workload,)
+    executors = EXECUTORS if args.executor == "all" else (args.executor,)
+    modes = ((ConcurrencyMode.PESSIMISTIC, ConcurrencyMode.OPTIMISTIC)
+             if args.mode == "all" else (args.mode,))
+
+    item_ids = create_hot_items(args.items)
+    try:
+        print(f"{args.buyers} buyers x {args.rounds} rounds competing for {args.items} item(s)\n")
+        print_header()
+        for executor_kind in executors:
+            with make_executor(executor_kind, args.buyers) as executor:
+                for workload in workloads:
+                    for mode, isolation_level in scenarios(modes, args.isolation):
+                        print_row(run_scenario(executor, executor_kind, workload, mode, isolation_level,
+                                               item_ids, args.buyers, args.rounds))
+    finally:
+        delete_hot_items(item_ids)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+benchmark_imports.py - Cold-start import benchmark for the Streamlit pages
+
+Imports every page in a fresh interpreter (without running it) and reports
+the import time, the peak resident memory of that interpreter and which of
+the heavy libraries got loaded. Pages should defer pandas, numpy,
+matplotlib and Pillow to the code paths that need them, and importing a
+page must not touch the database: the probes run with DB_HOST pointing at
+an unresolvable host, so any connection attempt at import fails the run.
+
+Usage:
+    python benchmark_imports.py
+    python benchmark_imports.py --repeat 5 --max-seconds 1.5 --max-rss-mb 250
+
+Exits with status 1 if a page fails to import or exceeds a budget. For a
+per-module breakdown of one page, use:
+    python -X importtime -c "import runpy; runpy.run_path('pages/3_Reports.py', run_name='probe')"
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PAGES = ["main.py", "pages/1_Create_Item.py", "pages/2_View_Items.py", "pages/3_Reports.py"]
+
+# Libraries that should only load when a page actually needs them
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "PIL", "sqlalchemy.orm"]
+
+# Runs in the fresh interpreter: import the page without executing app()
+PROBE = """
+import json, resource, runpy, sys, time
+started = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name="__import_benchmark__")
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy": [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+"""
+
+def probe_page(page):
+    """
+    Import one page in a fresh interpreter.
+
+    Returns:
+        dict: seconds, max_rss_kb and heavy (loaded heavy modules)
+
+    Raises:
+        RuntimeError: If the import failed
+    """
+    env = dict(os.environ, DB_HOST="import-benchmark.invalid")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, page, json.dumps(HEAVY_MODULES)],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and memory of every page")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per page (median is reported)")
+    parser.add_argument("--max-seconds", type=float, help="Fail if a page takes longer to import")
+    parser.add_argument("--max-rss-mb", type=float, help="Fail if a page needs more resident memory")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'Page':<26} {'Import s':>9} {'Peak RSS MB':>12}  Heavy modules loaded")
+    for page in PAGES:
+        try:
+            runs = [probe_page(page) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{page:<26} {'FAILED':>9} {'':>12}  {e}")
+            failed = True
+            continue
+
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss_mb = statistics.median(run["max_rss_kb"] for run in runs) / 1024
+        heavy = ", ".join(runs[0]["heavy"]) or "-"
+        print(f"{page:<26} {seconds:>9.3f} {rss_mb:>12.1f}  {heavy}")
+
+        if args.max_seconds is not None and seconds > args.max_seconds:
+            print(f"  ✗ import time above budget of {args.max_seconds:.3f}s")
+            failed = True
+        if args.max_rss_mb is not None and rss_mb > args.max_rss_mb:
+            print(f"  ✗ peak RSS above budget of {args.max_rss_mb:.1f} MB")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# secondhand_market/database/cache.py
+"""
+Shared result cache for browse and lookup queries.
+
+Query results are cached under a key built from the normalized SQL, its
+parameters and the current version of every data namespace the query
+reads ("items", "categories", ...). Writes call invalidate(namespace),
+which bumps the namespace version so every dependent entry is missed from
+then on and ages out of the cache. This works the same for both backends:
+
+    memory (default)   In-process LRU with per-entry TTL
+    redis              Any Redis-compatible server (Redis, Valkey, KeyDB, ...)
+
+Select the backend with the CACHE_URL environment variable, e.g.
+CACHE_URL=redis://localhost:6379/0. The redis package is only needed when
+a redis URL is configured.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Default seconds a cached result stays valid
+DEFAULT_TTL = 60
+
+# Maximum entries kept by the in-process backend
+MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+CACHE_URL = os.environ.get('CACHE_URL', 'memory://')
+
+# Namespaces used by the application
+ITEMS = "items"
+CATEGORIES = "categories"
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, namespace):
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCache:
+    """Cache backed by a Redis-compatible server, shared between processes."""
+
+    PREFIX = "shm:"
+
+    def __init__(self, url):
+        import redis  # Optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(self.PREFIX + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self.PREFIX + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def get_version(self, namespace):
+        raw = self._client.get(f"{self.PREFIX}version:{namespace}")
+        return int(raw) if raw is not None else 0
+
+    def bump_version(self, namespace):
+        self._client.incr(f"{self.PREFIX}version:{namespace}")
+
+    def clear(self):
+        for key in self._client.scan_iter(f"{self.PREFIX}*"):
+            self._client.delete(key)
+
+def _create_backend(url):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            return RedisCache(url)
+        except ImportError:
+            logger.warning("CACHE_URL points to redis but the redis package is not installed; "
+                           "falling back to the in-process cache")
+    return LRUCache()
+
+_backend = _create_backend(CACHE_URL)
+
+def get_backend():
+    """Return the active cache backend."""
+    return _backend
+
+def make_key(namespaces, sql, params=()):
+    """
+    Build a cache key from normalized SQL, parameters and namespace versions.
+
+    Args:
+        namespaces: Data namespaces the query depends on
+        sql: The query text
+        params: Query parameters
+    """
+    versions = ",".join(f"{ns}@{_backend.get_version(ns)}" for ns in sorted(namespaces))
+    normalized_sql = " ".join(sql.split())
+    raw = json.dumps([normalized_sql, [str(p) for p in params]])
+    return f"{versions}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+def get_or_set(key, loader, ttl=DEFAULT_TTL):
+    """
+    Return the cached value for key, calling loader() and caching its result on a miss.
+
+    Backend errors never break the page; the loader result is returned uncached.
+    """
+    try:
+        value = _backend.get(key)
+    except Exception as e:
+        logger.warning("Cache read failed: %s", e)
+        return loader()
+    if value is not None:
+        return value
+
+    value = loader()
+    try:
+        _backend.set(key, value, ttl)
+    except Exception as e:
+        logger.warning("Cache write failed: %s", e)
+    return value
+
+def cached_query(cursor, sql, params=(), namespaces=(ITEMS,), ttl=DEFAULT_TTL):
+    """
+    Run a query (or CALL) through the cache.
+
+    Args:
+        cursor: Cursor used to run the query on a cache miss
+        sql: Query text
+        params: Query parameters
+        namespaces: Data namespaces the result depends on
+        ttl: Seconds to cache the result
+
+    Returns:
+        list: The fetched rows
+    """
+    def load():
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        if sql.lstrip().upper().startswith("CALL"):
+            # Consume the procedure's trailing status result
+            while cursor.nextset():
+                pass
+        return rows
+
+    return get_or_set(make_key(namespaces, sql, params), load, ttl)
+
+def namespace_version(namespace):
+    """Return the current version of a namespace, or None if the backend is unavailable."""
+    try:
+        return _backend.get_version(namespace)
+    except Exception as e:
+        logger.warning("Cache version read failed for %s: %s", namespace, e)
+        return None
+
+def invalidate(*namespaces):
+    """
+    Invalidate every cached result that depends on the given namespaces.
+
+    Call after the write has been committed, e.g. invalidate(ITEMS) after an
+    item is created, edited, deleted or purchased.
+    """
+    for namespace in namespaces:
+        try:
+            _backend.bump_version(namespace)
+        except Exception as e:
+            logger.warning("Cache invalidation failed for %s: %s", namespace, e)
@@ -0,0 +1,149 @@
+# secondhand_market/database/categories.py
+"""
+In-memory category catalog.
+
+The categories table is small and rarely changes, so it is loaded once per
+process into a CategoryCatalog with name <-> id maps, the
+parent_category_id tree and, for every category, the set of ids of the
+category and all its subcategories (for "category and everything below
+it" filters).
+
+get_category_catalog() returns the shared catalog and reloads it when the
+"categories" cache namespace has been invalidated or after CATALOG_MAX_AGE
+seconds. The app never writes categories; migrations invalidate the
+namespace, which reaches running servers when they share a redis cache
+(CACHE_URL). Other changes, or any change with the in-process cache, show
+up within CATALOG_MAX_AGE.
+"""
+
+import threading
+import time
+from database.cache import CATEGORIES, namespace_version
+from database.db_setup import get_connection
+
+# Seconds before the catalog is reloaded even without an invalidation
+CATALOG_MAX_AGE = 300
+
+class CategoryCatalog:
+    """Snapshot of the categories table with lookup maps and the category tree."""
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows: (category_id, name, parent_category_id) tuples
+        """
+        self._name_by_id = {}
+        self._id_by_name = {}
+        self._parent_by_id = {}
+        self._children = {}
+        for category_id, name, parent_id in sorted(rows, key=lambda row: row[1]):
+            self._name_by_id[category_id] = name
+            self._id_by_name[name] = category_id
+            self._parent_by_id[category_id] = parent_id
+        for category_id, parent_id in self._parent_by_id.items():
+            # A dangling parent reference makes the category a root
+            if parent_id not in self._name_by_id:
+                self._parent_by_id[category_id] = None
+                parent_id = None
+            self._children.setdefault(parent_id, []).append(category_id)
+
+        self._tree_order = []
+        self._depth = {}
+        self._descendants = {}
+        self._walk(None, 0, set())
+        # Categories in a parent cycle are unreachable from a root; list them flat
+        for category_id in self._name_by_id:
+            if category_id not in self._descendants:
+                self._tree_order.append(category_id)
+                self._depth[category_id] = 0
+                self._descendants[category_id] = frozenset([category_id])
+
+    def _walk(self, parent_id, depth, seen):
+        """Fill tree order, depths and descendant sets below parent_id; returns all ids visited."""
+        below = set()
+        for category_id in self._children.get(parent_id, []):
+            if category_id in seen:
+                continue
+            seen.add(category_id)
+            self._tree_order.append(category_id)
+            self._depth[category_id] = depth
+            subtree = {category_id} | self._walk(category_id, depth + 1, seen)
+            self._descendants[category_id] = frozenset(subtree)
+            below |= subtree
+        return below
+
+    @classmethod
+    def load(cls):
+        """Read the categories table into a new catalog."""
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT category_id, name, parent_category_id FROM categories")
+            return cls(cur.fetchall())
+        finally:
+            cur.close()
+            conn.close()
+
+    def names(self):
+        """Category names in alphabetical order."""
+        return sorted(self._id_by_name)
+
+    def tree(self):
+        """Category ids in tree order (parents before their children, siblings by name)."""
+        return list(self._tree_order)
+
+    def id_for(self, name):
+        """Return the id of a category name, or None."""
+        return self._id_by_name.get(name)
+
+    def name_for(self, category_id):
+        """Return the name of a category id, or None."""
+        return self._name_by_id.get(category_id)
+
+    def parent_of(self, category_id):
+        """Return the parent category id, or None for a root category."""
+        return self._parent_by_id.get(category_id)
+
+    def depth(self, category_id):
+        """Return the nesting level of a category (0 for a root)."""
+        return self._depth.get(category_id, 0)
+
+    def label(self, category_id, indent="    "):
+        """Return the category name indented by its depth, for tree-shaped option lists."""
+        return indent * self.depth(category_id) + (self.name_for(category_id) or "")
+
+    def descendants(self, category_id):
+        """Return the ids of the category and all its subcategories (empty for an unknown id)."""
+        return self._descendants.get(category_id, frozenset())
+
+    def __len__(self):
+        return len(self._name_by_id)
+
+    def __contains__(self, category_id):
+        return category_id in self._name_by_id
+
+_catalog_lock = threading.Lock()
+_catalog = None
+_catalog_version = None
+_catalog_loaded_at = 0.0
+
+def get_category_catalog():
+    """
+    Return the shared category catalog, reloading it if it is stale.
+
+    Returns:
+        CategoryCatalog: The current catalog
+    """
+    global _catalog, _catalog_version, _catalog_loaded_at
+    version = namespace_version(CATEGORIES)
+    with _catalog_lock:
+        fresh = (
+            _catalog is not None
+            and version == _catalog_version
+            and time.monotonic() - _catalog_loaded_at < CATALOG_MAX_AGE
+        )
+        if not fresh:
+            _catalog = CategoryCatalog.load()
+            _catalog_version = version
+            _catalog_loaded_at = time.monotonic()
+        return _catalog
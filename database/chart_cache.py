@@ -0,0 +1,57 @@
+# secondhand_market/database/chart_cache.py
+"""
+Rendered chart cache for the Reports page.
+
+Charts are rendered once to PNG (or SVG) bytes and kept in the shared result
+cache (database.cache), keyed by the report name, its date range and a
+fingerprint of the plotted data. The fingerprint acts as the data version:
+while the report data is unchanged, reruns serve the cached image without
+touching matplotlib, and any change to the data renders a fresh chart.
+Every rendered figure is closed explicitly so pyplot does not keep it alive.
+"""
+
+import hashlib
+import io
+import json
+from database.cache import get_or_set
+
+# Seconds a rendered chart stays cached; unchanged data renders to the same key anyway
+CHART_TTL = 600
+
+# Render resolution for PNG charts
+CHART_DPI = 100
+
+def data_version(data):
+    """Return a short fingerprint of the rows or values a chart plots."""
+    raw = json.dumps(data, default=str, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+def render_chart(report, draw, data, start_date=None, end_date=None, fmt="png", ttl=CHART_TTL):
+    """
+    Return the rendered bytes of a chart, drawing it only on a cache miss.
+
+    Args:
+        report: Unique chart name, e.g. "category_bars"
+        draw: Callable that builds and returns a matplotlib Figure
+        data: The values plotted by draw (used as the data version)
+        start_date: Report start date, if the chart is date filtered
+        end_date: Report end date, if the chart is date filtered
+        fmt: "png" or "svg"
+        ttl: Seconds to cache the rendered chart
+
+    Returns:
+        bytes: The encoded image
+    """
+    key = f"chart:{report}:{fmt}:{start_date}:{end_date}:{data_version(data)}"
+
+    def render():
+        import matplotlib.pyplot as plt
+        fig = draw()
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=fmt, dpi=CHART_DPI)
+            return buffer.getvalue()
+        finally:
+            plt.close(fig)
+
+    return get_or_set(key, render, ttl)
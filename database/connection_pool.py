@@ -0,0 +1,120 @@
+# secondhand_market/database/connection_pool.py
+"""
+Process-wide connection pool shared by every database access path.
+
+The pool is a SQLAlchemy QueuePool bound to a single engine. The ORM
+sessions in orm_models.py use the engine directly, while get_connection()
+in db_setup.py (and therefore transaction() and the stored procedure calls)
+check out raw mysql-connector connections from the same pool. Calling
+close() on one of those connections returns it to the pool instead of
+tearing down the TCP connection.
+
+Pool behaviour is configured through environment variables:
+
+    DB_POOL_SIZE          Connections kept open in the pool (default 5)
+    DB_POOL_MAX_OVERFLOW  Extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT       Seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE       Max lifetime of a connection in seconds (default 1800)
+    DB_POOL_PRE_PING      Ping connections on checkout, "1" or "0" (default 1)
+
+Statements on both paths are timed and aggregated by query_stats.py.
+"""
+
+import os
+import threading
+import urllib.parse
+from sqlalchemy import create_engine, event
+from database.query_stats import instrument_connection, instrument_engine
+
+# Get MySQL credentials from environment or use defaults
+DB_HOST = os.environ.get('DB_HOST', 'localhost')
+DB_USER = os.environ.get('DB_USER', 'root')
+DB_PASSWORD = os.environ.get('DB_PASSWORD', 'Kkhiladi@420')
+DB_NAME = os.environ.get('DB_NAME', 'secondhand_market')
+
+# Pool settings
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') != '0'
+
+# URL encode the password to handle special characters like @
+encoded_password = urllib.parse.quote_plus(DB_PASSWORD)
+connection_string = f"mysql+mysqlconnector://{DB_USER}:{encoded_password}@{DB_HOST}/{DB_NAME}"
+
+# The single engine (and pool) for the whole process
+engine = create_engine(
+    connection_string,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=POOL_PRE_PING,
+)
+instrument_engine(engine)
+
+# Lifetime counters for monitoring, updated from pool events
+_stats_lock = threading.Lock()
+_counters = {
+    "connections_opened": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "invalidated": 0,
+}
+
+def _increment(name):
+    with _stats_lock:
+        _counters[name] += 1
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    _increment("connections_opened")
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    _increment("checkouts")
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    _increment("checkins")
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    _increment("invalidated")
+
+def get_pooled_connection():
+    """
+    Check out a raw mysql-connector connection from the shared pool.
+
+    The returned object behaves like a regular mysql-connector connection
+    (cursor(dictionary=True), start_transaction(), commit(), ...). Calling
+    close() hands it back to the pool. Its cursors record every statement
+    in query_stats.py.
+    """
+    return instrument_connection(engine.raw_connection())
+
+def get_pool_stats():
+    """
+    Return a snapshot of the pool state for monitoring.
+
+    Returns:
+        dict: Current pool occupancy plus lifetime event counters
+    """
+    pool = engine.pool
+    with _stats_lock:
+        counters = dict(_counters)
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "recycle_seconds": POOL_RECYCLE,
+        "pre_ping": POOL_PRE_PING,
+        **counters,
+    }
+
+def dispose_pool():
+    """Close every idle pooled connection, e.g. after a fork or on shutdown."""
+    engine.dispose()
@@ -0,0 +1,60 @@
+# secondhand_market/database/counting.py
+"""
+Result counting strategies for filtered browse queries.
+
+Counting a filtered listing used to re-run the page query (with its users
+join) as COUNT(*) on every rerun. count_items() instead:
+
+1. counts over items alone, since no filter references users or categories;
+2. caches counts in the shared result cache (database.cache) for COUNT_TTL
+   seconds; item writes invalidate them;
+3. stops scanning after APPROX_THRESHOLD rows and reports "1,000+", so only
+   small result sets pay for an exact count.
+"""
+
+from database.cache import ITEMS, get_or_set, make_key
+
+# Seconds a cached count stays valid
+COUNT_TTL = 30
+
+# Above this many matches the count is reported as approximate ("1,000+")
+APPROX_THRESHOLD = 1000
+
+def count_items(cursor, where_sql, params, threshold=APPROX_THRESHOLD, ttl=COUNT_TTL):
+    """
+    Count items matching a filter, cached and bounded.
+
+    Args:
+        cursor: An open cursor on the application database
+        where_sql: WHERE clause over the items table aliased as i
+            (e.g. "WHERE i.status = %s AND i.price BETWEEN %s AND %s")
+        params: Parameters for where_sql
+        threshold: Stop counting after this many rows; None for an exact count
+        ttl: Seconds to cache the result
+
+    Returns:
+        tuple: (count, is_exact); when is_exact is False the real count is
+        greater than count
+    """
+    def load():
+        if threshold is None:
+            cursor.execute(f"SELECT COUNT(*) AS total FROM items i {where_sql}", params)
+            return (_first_value(cursor.fetchone()), True)
+        # Scan at most threshold + 1 matching rows
+        cursor.execute(
+            f"SELECT COUNT(*) AS total FROM (SELECT 1 FROM items i {where_sql} LIMIT %s) AS matches",
+            list(params) + [threshold + 1]
+        )
+        total = _first_value(cursor.fetchone())
+        return (threshold, False) if total > threshold else (total, True)
+
+    key = make_key((ITEMS,), f"COUNT {where_sql} /* {threshold} */", params)
+    return get_or_set(key, load, ttl)
+
+def format_count(count, is_exact):
+    """Format a count for display, e.g. "42" or "1,000+"."""
+    return f"{count:,}" if is_exact else f"{count:,}+"
+
+def _first_value(row):
+    # Works for both dictionary and tuple cursors
+    return list(row.values())[0] if isinstance(row, dict) else row[0]
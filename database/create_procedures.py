@@ -1,127 +1,412 @@
 """
 This script creates stored procedures for our database.
+
+Procedures are deployed idempotently: each body is hashed and compared
+against the procedure_registry table (and information_schema.ROUTINES), so
+only new or changed procedures are dropped and recreated. Run it once at
+deploy time:
+
+    python -m database.create_procedures            # deploy changed procedures
+    python -m database.create_procedures --force    # redeploy everything
 """
+import argparse
+import hashlib
 from database.db_setup import get_connection
 
-def create_procedures():
-    """Create stored procedures in the database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Drop existing procedures before recreating
-    cursor.execute("DROP PROCEDURE IF EXISTS get_marketplace_stats")
-    cursor.execute("DROP PROCEDURE IF EXISTS category_analysis")
-    cursor.execute("DROP PROCEDURE IF EXISTS price_distribution")
-    cursor.execute("DROP PROCEDURE IF EXISTS get_items_by_filter")
-    cursor.execute("DROP PROCEDURE IF EXISTS get_transaction_history")
-    
-    # Create procedure for marketplace statistics
-    cursor.execute("""
+# Procedure name -> CREATE PROCEDURE statement, in deployment order
+PROCEDURES = {}
+
+# Report procedures read the daily rollups (see rollups.py) instead of scanning
+# items. Date bounds are whole days, both inclusive.
+
+# Procedure for marketplace statistics
+PROCEDURES["get_marketplace_stats"] = """
     CREATE PROCEDURE get_marketplace_stats(IN start_date_param VARCHAR(20), IN end_date_param VARCHAR(20))
     BEGIN
         SELECT 
-            COUNT(*) AS total_items,
-            SUM(CASE WHEN status = 'Available' THEN 1 ELSE 0 END) AS available_count,
-            SUM(CASE WHEN status = 'Sold' THEN 1 ELSE 0 END) AS sold_count,
-            ROUND(AVG(price), 2) AS avg_price
-        FROM items
-        WHERE (start_date_param IS NULL OR created_at >= start_date_param)
-        AND (end_date_param IS NULL OR created_at <= end_date_param);
+            CAST(COALESCE(SUM(item_count), 0) AS SIGNED) AS total_items,
+            CAST(COALESCE(SUM(CASE WHEN status = 'Available' THEN item_count ELSE 0 END), 0) AS SIGNED) AS available_count,
+            CAST(COALESCE(SUM(CASE WHEN status = 'Sold' THEN item_count ELSE 0 END), 0) AS SIGNED) AS sold_count,
+            ROUND(SUM(price_sum) / NULLIF(SUM(priced_count), 0), 2) AS avg_price
+        FROM item_daily_rollup
+        WHERE (start_date_param IS NULL OR day >= start_date_param)
+        AND (end_date_param IS NULL OR day <= end_date_param);
     END
-    """)
-    
-    # Create procedure for category analysis
-    cursor.execute("""
+"""
+
+# Procedure for category analysis
+PROCEDURES["category_analysis"] = """
     CREATE PROCEDURE category_analysis(IN start_date_param VARCHAR(20), IN end_date_param VARCHAR(20))
     BEGIN
         SELECT 
             COALESCE(c.name, 'Uncategorized') AS category,
-            COUNT(i.item_id) AS item_count,
-            ROUND(AVG(i.price), 2) AS avg_price,
-            SUM(CASE WHEN i.status = 'Sold' THEN 1 ELSE 0 END) AS sold_count
-        FROM items i
-        LEFT JOIN categories c ON i.category_id = c.category_id
-        WHERE (start_date_param IS NULL OR i.created_at >= start_date_param)
-        AND (end_date_param IS NULL OR i.created_at <= end_date_param)
-        GROUP BY c.category_id
+            CAST(SUM(r.item_count) AS SIGNED) AS item_count,
+            ROUND(SUM(r.price_sum) / NULLIF(SUM(r.priced_count), 0), 2) AS avg_price,
+            CAST(SUM(CASE WHEN r.status = 'Sold' THEN r.item_count ELSE 0 END) AS SIGNED) AS sold_count
+        FROM item_daily_rollup r
+        LEFT JOIN categories c ON r.category_id = c.category_id
+        WHERE (start_date_param IS NULL OR r.day >= start_date_param)
+        AND (end_date_param IS NULL OR r.day <= end_date_param)
+        GROUP BY r.category_id, c.name
         ORDER BY item_count DESC;
     END
-    """)
-    
-    # Create procedure for price distribution analysis
-    cursor.execute("""
+"""
+
+# Procedure for price distribution analysis; labels match rollups.PRICE_BUCKETS
+PROCEDURES["price_distribution"] = """
     CREATE PROCEDURE price_distribution()
     BEGIN
         SELECT 
-            CASE
-                WHEN price BETWEEN 0 AND 10 THEN '$0-$10'
-                WHEN price BETWEEN 10 AND 25 THEN '$10-$25'
-                WHEN price BETWEEN 25 AND 50 THEN '$25-$50'
-                WHEN price BETWEEN 50 AND 100 THEN '$50-$100'
-                WHEN price BETWEEN 100 AND 250 THEN '$100-$250'
-                WHEN price BETWEEN 250 AND 500 THEN '$250-$500'
-                WHEN price > 500 THEN '$500+'
-                ELSE 'Unknown'
-            END AS price_range,
-            COUNT(*) AS item_count
-        FROM items
-        GROUP BY price_range;
+            ELT(price_bucket + 1, '$0-$10', '$10-$25', '$25-$50', '$50-$100',
+                '$100-$250', '$250-$500', '$500+', 'Unknown') AS price_range,
+            CAST(SUM(item_count) AS SIGNED) AS item_count
+        FROM item_daily_rollup
+        GROUP BY price_bucket
+        ORDER BY price_bucket;
     END
-    """)
-    
-    # Create procedure to get items by filter (updated for category_id)
-    cursor.execute("""
+"""
+
+# All Reports dashboard aggregates in one call, as consecutive result sets:
+# overview and categories for the selected period, then price by condition,
+# price buckets, the last 12 months and seller activity (see reports.py)
+PROCEDURES["get_report_data"] = """
+    CREATE PROCEDURE get_report_data(IN start_date_param VARCHAR(20), IN end_date_param VARCHAR(20))
+    BEGIN
+        SELECT 
+            CAST(COALESCE(SUM(item_count), 0) AS SIGNED) AS total_items,
+            CAST(COALESCE(SUM(CASE WHEN status = 'Available' THEN item_count ELSE 0 END), 0) AS SIGNED) AS available_count,
+            CAST(COALESCE(SUM(CASE WHEN status = 'Sold' THEN item_count ELSE 0 END), 0) AS SIGNED) AS sold_count,
+            ROUND(SUM(price_sum) / NULLIF(SUM(priced_count), 0), 2) AS avg_price
+        FROM item_daily_rollup
+        WHERE (start_date_param IS NULL OR day >= start_date_param)
+        AND (end_date_param IS NULL OR day <= end_date_param);
+
+        SELECT 
+            COALESCE(c.name, 'Uncategorized') AS category,
+            CAST(SUM(r.item_count) AS SIGNED) AS item_count,
+            ROUND(SUM(r.price_sum) / NULLIF(SUM(r.priced_count), 0), 2) AS avg_price,
+            CAST(SUM(CASE WHEN r.status = 'Sold' THEN r.item_count ELSE 0 END) AS SIGNED) AS sold_count
+        FROM item_daily_rollup r
+        LEFT JOIN categories c ON r.category_id = c.category_id
+        WHERE (start_date_param IS NULL OR r.day >= start_date_param)
+        AND (end_date_param IS NULL OR r.day <= end_date_param)
+        GROUP BY r.category_id, c.name
+        ORDER BY item_count DESC;
+
+        SELECT 
+            NULLIF(condition_status, '') AS condition_status,
+            ROUND(SUM(price_sum) / NULLIF(SUM(priced_count), 0), 2) AS avg_price,
+            MIN(price_min) AS min_price,
+            MAX(price_max) AS max_price,
+            CAST(SUM(item_count) AS SIGNED) AS item_count
+        FROM item_daily_rollup
+        GROUP BY condition_status
+        ORDER BY 
+            CASE 
+                WHEN condition_status = 'New' THEN 1
+                WHEN condition_status = 'Like New' THEN 2
+                WHEN condition_status = 'Good' THEN 3
+                WHEN condition_status = 'Fair' THEN 4
+                WHEN condition_status = 'Poor' THEN 5
+                ELSE 6
+            END;
+
+        SELECT 
+            ELT(price_bucket + 1, '$0-$10', '$10-$25', '$25-$50', '$50-$100',
+                '$100-$250', '$250-$500', '$500+', 'Unknown') AS price_range,
+            CAST(SUM(item_count) AS SIGNED) AS item_count
+        FROM item_daily_rollup
+        GROUP BY price_bucket
+        ORDER BY price_bucket;
+
+        SELECT 
+            DATE_FORMAT(day, '%Y-%m') AS month,
+            CAST(SUM(item_count) AS SIGNED) AS item_count,
+            ROUND(SUM(price_sum) / NULLIF(SUM(priced_count), 0), 2) AS avg_price,
+            CAST(SUM(CASE WHEN status = 'Sold' THEN item_count ELSE 0 END) AS SIGNED) AS sold_count
+        FROM item_daily_rollup
+        WHERE day >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
+        GROUP BY DATE_FORMAT(day, '%Y-%m')
+        ORDER BY month;
+
+        SELECT 
+            u.username,
+            CAST(SUM(r.item_count) AS SIGNED) AS item_count,
+            CAST(SUM(CASE WHEN r.status = 'Sold' THEN r.item_count ELSE 0 END) AS SIGNED) AS sold_count,
+            ROUND(SUM(r.price_sum) / NULLIF(SUM(r.priced_count), 0), 2) AS avg_price,
+            MIN(r.first_created_at) AS first_listing,
+            MAX(r.last_created_at) AS last_listing
+        FROM item_daily_rollup r
+        JOIN users u ON u.user_id = r.seller_id
+        GROUP BY u.user_id, u.username
+        HAVING item_count > 0
+        ORDER BY item_count DESC;
+    END
+"""
+
+# Procedure to get one keyset page of items by filter (updated for category_id).
+# Only the filters in use (non-NULL parameters) are emitted, so each filter
+# shape gets its own prepared statement that can use an index range scan.
+# sort_column_param/sort_direction_param are whitelisted before being spliced
+# into the statement; keyset_value_param/keyset_id_param are the sort key and
+# item_id of the row to continue after (keyset_id_param is NULL for the first
+# page; keyset_value_param is NULL when that row's sort key is NULL, which
+# MySQL sorts first ascending and last descending). The statement stays in
+# @sql for EXPLAIN (see tests/test_query_plans.py).
+PROCEDURES["get_items_by_filter"] = """
     CREATE PROCEDURE get_items_by_filter(
         IN category_id_param INT,
         IN min_price_param DECIMAL(10, 2),
         IN max_price_param DECIMAL(10, 2),
         IN condition_param VARCHAR(50),
-        IN status_param VARCHAR(50)
+        IN status_param VARCHAR(50),
+        IN sort_column_param VARCHAR(20),
+        IN sort_direction_param VARCHAR(4),
+        IN keyset_value_param VARCHAR(255),
+        IN keyset_id_param INT,
+        IN page_size_param INT
     )
     BEGIN
-        SELECT i.*, u.username, u.email, c.name as category 
-        FROM items i 
-        LEFT JOIN users u ON i.seller_id = u.user_id 
-        LEFT JOIN categories c ON i.category_id = c.category_id
-        WHERE 1=1
-            AND (category_id_param IS NULL OR i.category_id = category_id_param)
-            AND (i.price BETWEEN min_price_param AND max_price_param)
-            AND (condition_param IS NULL OR condition_param = '' OR condition_param = 'All Conditions' OR i.condition_status = condition_param)
-            AND (status_param IS NULL OR status_param = '' OR i.status = status_param)
-        ORDER BY i.created_at DESC;
+        DECLARE sort_column VARCHAR(20) DEFAULT 'created_at';
+        DECLARE sort_direction VARCHAR(4) DEFAULT 'DESC';
+        DECLARE op CHAR(1) DEFAULT '<';
+        DECLARE keyset_value VARCHAR(64) DEFAULT '@keyset_value';
+
+        IF sort_column_param IN ('created_at', 'price', 'title') THEN
+            SET sort_column = sort_column_param;
+        END IF;
+        IF sort_direction_param = 'ASC' THEN
+            SET sort_direction = 'ASC';
+            SET op = '>';
+        END IF;
+        IF category_id_param = 0 THEN
+            SET category_id_param = NULL;
+        END IF;
+        IF condition_param IN ('', 'All Conditions') THEN
+            SET condition_param = NULL;
+        END IF;
+        IF status_param = '' THEN
+            SET status_param = NULL;
+        END IF;
+        IF sort_column = 'created_at' THEN
+            SET keyset_value = 'CAST(@keyset_value AS DATETIME)';
+        ELSEIF sort_column = 'price' THEN
+            SET keyset_value = 'CAST(@keyset_value AS DECIMAL(10, 2))';
+        END IF;
+
+        SET @category_id = category_id_param;
+        SET @min_price = min_price_param;
+        SET @max_price = max_price_param;
+        SET @condition_status = condition_param;
+        SET @status = status_param;
+        SET @keyset_value = keyset_value_param;
+        SET @keyset_id = keyset_id_param;
+        SET @page_size = page_size_param;
+
+        SET @sql = CONCAT(
+            'SELECT i.item_id, i.title, i.description, i.price, i.condition_status, ',
+            '       i.created_at, i.status, i.seller_id, i.category_id, ',
+            '       i.contact_preference, i.location, i.has_image, ',
+            '       u.username, u.email, c.name as category ',
+            'FROM items i ',
+            'LEFT JOIN users u ON i.seller_id = u.user_id ',
+            'LEFT JOIN categories c ON i.category_id = c.category_id ',
+            'WHERE 1=1 ',
+            IF(category_id_param IS NULL, '', '  AND i.category_id = @category_id '),
+            IF(min_price_param IS NULL, '', '  AND i.price >= @min_price '),
+            IF(max_price_param IS NULL, '', '  AND i.price <= @max_price '),
+            IF(condition_param IS NULL, '', '  AND i.condition_status = @condition_status '),
+            IF(status_param IS NULL, '', '  AND i.status = @status '),
+            IF(keyset_id_param IS NULL, '',
+               IF(keyset_value_param IS NULL,
+                  IF(op = '>',
+                     CONCAT('  AND (i.', sort_column, ' IS NULL AND i.item_id > @keyset_id',
+                            ' OR i.', sort_column, ' IS NOT NULL) '),
+                     CONCAT('  AND i.', sort_column, ' IS NULL AND i.item_id < @keyset_id ')),
+                  CONCAT('  AND (i.', sort_column, ' ', op, '= ', keyset_value,
+                         ' AND (i.', sort_column, ' ', op, ' ', keyset_value,
+                         ' OR i.item_id ', op, ' @keyset_id)',
+                         IF(op = '<', CONCAT(' OR i.', sort_column, ' IS NULL'), ''),
+                         ') '))),
+            'ORDER BY i.', sort_column, ' ', sort_direction, ', i.item_id ', sort_direction, ' ',
+            'LIMIT ?'
+        );
+
+        PREPARE stmt FROM @sql;
+        EXECUTE stmt USING @page_size;
+        DEALLOCATE PREPARE stmt;
     END
-    """)
-    
-    # Create new procedure for transaction history reporting
-    cursor.execute("""
+"""
+
+# Procedure for transaction history reporting. Dates are a half-open range
+# (transaction_date >= start AND < end_before) on the raw column, and only the
+# filters in use are emitted, so seller/buyer + date lookups can range-scan
+# transactions_seller_date_idx / transactions_buyer_date_idx. The statement
+# shape matches transaction_queries.build_transaction_filter().
+#
+# Returns two result sets: one keyset page of rows (newest first, after the
+# (keyset_date_param, keyset_id_param) boundary when given), then the totals
+# (count, sum, average price) over every matching transaction. Both
+# statements stay in @history_sql / @history_totals_sql for EXPLAIN (see
+# tests/test_query_plans.py).
+#
+# keyset_id_param (a primary key, never NULL for a real row) says whether a
+# boundary is given; keyset_date_param is NULL when the boundary row has no
+# transaction_date. Such rows sort last under DESC, so after a dated
+# boundary the NULL-dated rows still follow, and after an undated one only
+# older undated rows remain.
+PROCEDURES["get_transaction_history"] = """
     CREATE PROCEDURE get_transaction_history(
-        IN start_date_param DATE,
-        IN end_date_param DATE,
+        IN start_param DATETIME,
+        IN end_before_param DATETIME,
         IN seller_id_param INT,
-        IN buyer_id_param INT
+        IN buyer_id_param INT,
+        IN keyset_date_param DATETIME,
+        IN keyset_id_param INT,
+        IN page_size_param INT
+    )
+    BEGIN
+        DECLARE filters TEXT;
+
+        SET @history_start = start_param;
+        SET @history_end_before = end_before_param;
+        SET @history_seller_id = seller_id_param;
+        SET @history_buyer_id = buyer_id_param;
+        SET @history_keyset_date = keyset_date_param;
+        SET @history_keyset_id = keyset_id_param;
+        SET @history_page_size = page_size_param;
+
+        SET filters = CONCAT(
+            'WHERE 1=1 ',
+            IF(seller_id_param IS NULL, '', '  AND t.seller_id = @history_seller_id '),
+            IF(buyer_id_param IS NULL, '', '  AND t.buyer_id = @history_buyer_id '),
+            IF(start_param IS NULL, '', '  AND t.transaction_date >= @history_start '),
+            IF(end_before_param IS NULL, '', '  AND t.transaction_date < @history_end_before ')
+        );
+
+        SET @history_sql = CONCAT(
+            'SELECT t.*, ',
+            '       i.title as item_title, ',
+            '       s.username as seller_name, ',
+            '       b.username as buyer_name ',
+            'FROM transactions t ',
+            'JOIN items i ON t.item_id = i.item_id ',
+            'JOIN users s ON t.seller_id = s.user_id ',
+            'JOIN users b ON t.buyer_id = b.user_id ',
+            filters,
+            IF(keyset_id_param IS NULL, '',
+               IF(keyset_date_param IS NULL,
+                  '  AND t.transaction_date IS NULL AND t.transaction_id < @history_keyset_id ',
+                  CONCAT('  AND (t.transaction_date <= @history_keyset_date ',
+                         'AND (t.transaction_date < @history_keyset_date OR t.transaction_id < @history_keyset_id) ',
+                         'OR t.transaction_date IS NULL) '))),
+            'ORDER BY t.transaction_date DESC, t.transaction_id DESC ',
+            'LIMIT ?'
+        );
+
+        PREPARE stmt FROM @history_sql;
+        EXECUTE stmt USING @history_page_size;
+        DEALLOCATE PREPARE stmt;
+
+        SET @history_totals_sql = CONCAT(
+            'SELECT COUNT(*) AS total_transactions, ',
+            '       COALESCE(SUM(t.price), 0) AS total_value, ',
+            '       ROUND(AVG(t.price), 2) AS avg_price ',
+            'FROM transactions t ',
+            filters
+        );
+
+        PREPARE stmt FROM @history_totals_sql;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END
+"""
+
+# Procedure for ranked full-text item search (search_text_param is a BOOLEAN MODE
+# string built by database.search.build_boolean_query)
+PROCEDURES["search_items"] = """
+    CREATE PROCEDURE search_items(
+        IN search_text_param VARCHAR(255),
+        IN limit_param INT
     )
     BEGIN
-        SELECT t.*, 
-               i.title as item_title, 
-               s.username as seller_name,
-               b.username as buyer_name
-        FROM transactions t
-        JOIN items i ON t.item_id = i.item_id
-        JOIN users s ON t.seller_id = s.user_id
-        JOIN users b ON t.buyer_id = b.user_id
-        WHERE (start_date_param IS NULL OR DATE(t.transaction_date) >= start_date_param)
-          AND (end_date_param IS NULL OR DATE(t.transaction_date) <= end_date_param)
-          AND (seller_id_param IS NULL OR t.seller_id = seller_id_param)
-          AND (buyer_id_param IS NULL OR t.buyer_id = buyer_id_param)
-        ORDER BY t.transaction_date DESC;
+        SELECT i.item_id, i.title, i.description, i.price, i.condition_status,
+               i.created_at, i.status, i.seller_id, i.category_id,
+               i.contact_preference, i.location, i.has_image,
+               u.username, u.email, c.name as category,
+               MATCH(i.title, i.description) AGAINST (search_text_param IN BOOLEAN MODE) AS relevance
+        FROM items i
+        LEFT JOIN users u ON i.seller_id = u.user_id
+        LEFT JOIN categories c ON i.category_id = c.category_id
+        WHERE MATCH(i.title, i.description) AGAINST (search_text_param IN BOOLEAN MODE)
+        ORDER BY relevance DESC
+        LIMIT limit_param;
     END
+"""
+
+def procedure_checksum(body):
+    """Return a SHA-256 checksum of a procedure body, ignoring indentation and blank lines."""
+    normalized = "\n".join(line.strip() for line in body.strip().splitlines() if line.strip())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def deploy_procedures(force=False):
+    """
+    Create or update stored procedures whose body changed since the last deploy.
+
+    Args:
+        force: Drop and recreate every procedure regardless of checksum
+
+    Returns:
+        list: Names of the procedures that were (re)created
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Checksums recorded by previous deployments
+    cursor.execute("SELECT name, checksum FROM procedure_registry")
+    deployed_checksums = dict(cursor.fetchall())
+
+    # Procedures that actually exist in the database
+    cursor.execute("""
+        SELECT ROUTINE_NAME FROM information_schema.ROUTINES
+        WHERE ROUTINE_SCHEMA = DATABASE() AND ROUTINE_TYPE = 'PROCEDURE'
     """)
-    
+    existing_routines = {row[0] for row in cursor.fetchall()}
+
+    deployed = []
+    for name, body in PROCEDURES.items():
+        checksum = procedure_checksum(body)
+        if (not force and name in existing_routines
+                and deployed_checksums.get(name) == checksum):
+            continue
+
+        cursor.execute(f"DROP PROCEDURE IF EXISTS {name}")
+        cursor.execute(body)
+        cursor.execute("""
+            INSERT INTO procedure_registry (name, checksum) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE checksum = VALUES(checksum), deployed_at = CURRENT_TIMESTAMP
+        """, (name, checksum))
+        deployed.append(name)
+
     conn.commit()
     cursor.close()
     conn.close()
-    
-    print("Stored procedures created successfully!")
+
+    if deployed:
+        print(f"Deployed stored procedures: {', '.join(deployed)}")
+    else:
+        print("Stored procedures are up to date.")
+    return deployed
+
+def create_procedures(force=False):
+    """Create stored procedures in the database (see deploy_procedures)."""
+    return deploy_procedures(force=force)
+
+def main():
+    parser = argparse.ArgumentParser(description="Deploy SecondHand Market stored procedures")
+    parser.add_argument("--force", action="store_true", help="Redeploy every procedure")
+    args = parser.parse_args()
+    deploy_procedures(force=args.force)
 
 if __name__ == "__main__":
-    create_procedures() 
\ No newline at end of file
+    main()
@@ -0,0 +1,127 @@
+# secondhand_market/database/item_queries.py
+"""
+Shared item queries for the browse pages.
+
+Listing queries select an explicit projection that never includes the
+image_data LONGBLOB. The stored has_image column (migration 11) tells the
+page whether to fetch the image separately by item_id, without touching
+image_data.
+"""
+
+from database.db_setup import get_connection
+
+# Columns for item cards and lists. Any expression on image_data would make
+# InnoDB read the off-page BLOB of every row, so the flag is a stored column.
+LISTING_COLUMNS = """
+    i.item_id, i.title, i.description, i.price, i.condition_status,
+    i.created_at, i.status, i.seller_id, i.category_id,
+    i.contact_preference, i.location, i.has_image,
+    u.username, u.email, c.name AS category
+"""
+
+LISTING_FROM = """
+    FROM items i
+    LEFT JOIN users u ON i.seller_id = u.user_id
+    LEFT JOIN categories c ON i.category_id = c.category_id
+"""
+
+def get_item_listing(item_id):
+    """
+    Fetch the listing row for a single item, without its image.
+
+    Args:
+        item_id: ID of the item
+
+    Returns:
+        dict or None: The listing row
+    """
+    con = get_connection()
+    cur = con.cursor(dictionary=True)
+    cur.execute(f"SELECT {LISTING_COLUMNS} {LISTING_FROM} WHERE i.item_id = %s", (item_id,))
+    row = cur.fetchone()
+    cur.close()
+    con.close()
+    return row
+
+def get_item_image(item_id):
+    """
+    Lazily fetch the full-size image of one item.
+
+    Args:
+        item_id: ID of the item
+
+    Returns:
+        bytes or None: The stored image data
+    """
+    con = get_connection()
+    cur = con.cursor()
+    cur.execute("SELECT image_data FROM items WHERE item_id = %s", (item_id,))
+    row = cur.fetchone()
+    cur.close()
+    con.close()
+    return row[0] if row else None
+
+def build_item_filter(category_id=None, min_price=None, max_price=None, condition=None,
+                      status=None, created_from=None, created_before=None):
+    """
+    Build a sargable WHERE clause over items containing only the filters in use.
+
+    Unused filters are left out entirely instead of being written as
+    (param IS NULL OR col = param), so MySQL can pick an index range scan
+    (e.g. category_price_condition_idx or status_created_at_idx) for every
+    filter combination. Dates are half-open ranges on the raw column.
+
+    Args:
+        category_id: Category to match, a collection of category ids (e.g. a
+            category and its subcategories), or None/0 for all categories
+        min_price: Lower price bound, or None
+        max_price: Upper price bound, or None
+        condition: Condition to match, or None/'All Conditions'
+        status: Status to match, or None/'All'
+        created_from: Earliest created_at (inclusive), or None
+        created_before: created_at upper bound (exclusive), or None
+
+    Returns:
+        tuple: (where_sql, params); further predicates can be appended as " AND ..."
+    """
+    clauses = []
+    params = []
+
+    if isinstance(category_id, (set, frozenset, list, tuple)):
+        category_ids = sorted(category_id)
+        if len(category_ids) == 1:
+            category_id = category_ids[0]
+        elif category_ids:
+            clauses.append(f"i.category_id IN ({', '.join(['%s'] * len(category_ids))})")
+            params.extend(category_ids)
+            category_id = None
+        else:
+            category_id = None
+    if category_id:
+        clauses.append("i.category_id = %s")
+        params.append(category_id)
+    if min_price is not None and max_price is not None:
+        clauses.append("i.price BETWEEN %s AND %s")
+        params.extend([min_price, max_price])
+    elif min_price is not None:
+        clauses.append("i.price >= %s")
+        params.append(min_price)
+    elif max_price is not None:
+        clauses.append("i.price <= %s")
+        params.append(max_price)
+    if condition and condition != "All Conditions":
+        clauses.append("i.condition_status = %s")
+        params.append(condition)
+    if status and status != "All":
+        clauses.append("i.status = %s")
+        params.append(status)
+    if created_from is not None:
+        clauses.append("i.created_at >= %s")
+        params.append(created_from)
+    if created_before is not None:
+        clauses.append("i.created_at < %s")
+        params.append(created_before)
+
+    # 1=1 keeps the clause valid for appended predicates; the optimizer folds it away
+    where_sql = "WHERE " + " AND ".join(clauses) if clauses else "WHERE 1=1"
+    return where_sql, params
@@ -0,0 +1,112 @@
+# secondhand_market/database/logging_config.py
+"""
+Non-blocking logging setup for the application.
+
+configure_logging() replaces logging.basicConfig(): the root logger gets a
+QueueHandler, and a QueueListener thread formats and writes the records, so
+a logger.info() in a transaction costs a queue put instead of a formatted
+write to stderr. Messages are formatted lazily in the listener thread, so
+call sites should pass arguments (logger.info("Item %s", item_id)) rather
+than pre-formatted f-strings.
+
+Routine INFO/DEBUG records of the transaction manager ("Transaction
+started", "committed", ...) are sampled; warnings and errors always pass.
+
+Configuration through environment variables:
+
+    LOG_LEVEL                    Root log level (default INFO)
+    LOG_FORMAT                   "text" (default) or "json" (one JSON object per line)
+    LOG_TRANSACTION_SAMPLE_RATE  Fraction of routine transaction records kept (default 0.01)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+TRANSACTION_SAMPLE_RATE = float(os.environ.get('LOG_TRANSACTION_SAMPLE_RATE', 0.01))
+
+TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+# Loggers whose routine records are sampled
+SAMPLED_LOGGERS = ("database.transaction_manager",)
+
+_configure_lock = threading.Lock()
+_configured = False
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of records at or below max_level; always keep the rest."""
+
+    def __init__(self, rate, max_level=logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record):
+        return record.levelno > self.max_level or random.random() < self.rate
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() merges msg and args in the calling thread. The
+    # queue never leaves the process, so hand the record over as is and let
+    # the listener thread do the formatting.
+    def prepare(self, record):
+        return record
+
+def configure_logging(level=LOG_LEVEL, json_format=(LOG_FORMAT == "json"),
+                      sample_rate=TRANSACTION_SAMPLE_RATE):
+    """
+    Route logging through a background listener thread. Safe to call more than once.
+
+    Like logging.basicConfig(), the root handlers are left alone if the
+    application already configured some; the transaction log sampling is
+    applied either way.
+
+    Args:
+        level: Root log level name or number
+        json_format: Write JSON lines instead of plain text
+        sample_rate: Fraction of routine transaction records to keep
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        _configured = True
+
+        for name in SAMPLED_LOGGERS:
+            logging.getLogger(name).addFilter(SamplingFilter(sample_rate))
+
+        root = logging.getLogger()
+        if root.handlers:
+            return
+
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        root.addHandler(_LazyQueueHandler(log_queue))
+        root.setLevel(level)
+
+        listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(listener.stop)
@@ -0,0 +1,505 @@
+# secondhand_market/database/migrations.py
+"""
+Versioned schema migrations for the SecondHand Market database.
+
+Each migration is a numbered step that is applied exactly once and recorded
+in the schema_version table. Schema changes are deployed with the CLI:
+
+    python -m database.migrations            # apply pending migrations, deploy
+                                             # changed stored procedures,
+                                             # refresh report rollups and
+                                             # render missing thumbnails
+    python -m database.migrations status     # show current/latest version
+
+The application itself only runs schema_is_current(), a single cheap
+SELECT that is remembered for the lifetime of the process, so no DDL is
+ever issued on the request path.
+
+To change the schema, append a new (version, description, function) entry
+to MIGRATIONS. Never edit a migration that has already been released.
+"""
+
+import argparse
+import logging
+import mysql.connector
+from sqlalchemy.exc import SQLAlchemyError
+from database.cache import CATEGORIES, invalidate
+from database.connection_pool import (
+    DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, get_pooled_connection
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORIES = [
+    ("Electronics", "Electronic devices and accessories"),
+    ("Clothing", "Apparel and fashion items"),
+    ("Furniture", "Home and office furniture"),
+    ("Books", "Books, textbooks, and literature"),
+    ("Sports & Outdoors", "Sporting goods and outdoor equipment"),
+    ("Home & Kitchen", "Household and kitchen items"),
+    ("Toys & Games", "Toys, games, and entertainment items"),
+    ("Beauty & Health", "Beauty products and health items"),
+    ("Other", "Miscellaneous items")
+]
+
+# ---------------------------------------------------------------------------
+# Migration steps
+# ---------------------------------------------------------------------------
+
+def _create_base_schema(cur):
+    """Create the users, categories, items and transactions tables with seed rows."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(100) NOT NULL,
+            email VARCHAR(255),
+            phone VARCHAR(50),
+            password_hash VARCHAR(255)
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            category_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            description TEXT,
+            parent_category_id INT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_category_id) REFERENCES categories(category_id) ON DELETE SET NULL
+        );
+    """)
+
+    cur.execute("SELECT COUNT(*) FROM categories")
+    if cur.fetchone()[0] == 0:
+        cur.executemany(
+            "INSERT INTO categories (name, description) VALUES (%s, %s)",
+            DEFAULT_CATEGORIES
+        )
+        print("Created default categories")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS items (
+            item_id INT AUTO_INCREMENT PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            price DECIMAL(10, 2),
+            condition_status VARCHAR(50),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            status VARCHAR(50) DEFAULT 'Available',
+            seller_id INT,
+            category_id INT,
+            contact_preference VARCHAR(50),
+            location VARCHAR(255),
+            image_data LONGBLOB,
+            FOREIGN KEY (seller_id) REFERENCES users(user_id),
+            FOREIGN KEY (category_id) REFERENCES categories(category_id)
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+            item_id INT NOT NULL,
+            seller_id INT NOT NULL,
+            buyer_id INT NOT NULL,
+            transaction_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            price DECIMAL(10, 2) NOT NULL,
+            status VARCHAR(50) DEFAULT 'Completed',
+            payment_method VARCHAR(50),
+            notes TEXT,
+            FOREIGN KEY (item_id) REFERENCES items(item_id),
+            FOREIGN KEY (seller_id) REFERENCES users(user_id),
+            FOREIGN KEY (buyer_id) REFERENCES users(user_id)
+        );
+    """)
+
+    cur.execute("SELECT COUNT(*) FROM users")
+    if cur.fetchone()[0] == 0:
+        cur.execute("""
+            INSERT INTO users (username, email, phone)
+            VALUES ('default_user', 'default@example.com', '555-123-4567')
+        """)
+        print("Created default user with ID 1")
+
+def _upgrade_legacy_columns(cur):
+    """Bring databases created before category_id/contact columns existed up to date."""
+    cur.execute("SHOW COLUMNS FROM items")
+    existing_item_columns = [column[0] for column in cur.fetchall()]
+
+    if "category_id" not in existing_item_columns:
+        cur.execute("ALTER TABLE items ADD COLUMN category_id INT")
+        cur.execute("ALTER TABLE items ADD FOREIGN KEY (category_id) REFERENCES categories(category_id)")
+        print("Added category_id column to items table")
+
+    # Migrate legacy category names to category_id values in one statement
+    if "category" in existing_item_columns:
+        cur.execute("""
+            UPDATE items i
+            JOIN categories c ON c.name = i.category
+            SET i.category_id = c.category_id
+            WHERE i.category_id IS NULL AND i.category IS NOT NULL
+        """)
+
+    if "contact_preference" not in existing_item_columns:
+        cur.execute("ALTER TABLE items ADD COLUMN contact_preference VARCHAR(50)")
+
+    if "location" not in existing_item_columns:
+        cur.execute("ALTER TABLE items ADD COLUMN location VARCHAR(255)")
+
+    if "image_data" not in existing_item_columns:
+        cur.execute("ALTER TABLE items ADD COLUMN image_data LONGBLOB")
+
+    cur.execute("SHOW COLUMNS FROM users")
+    existing_user_columns = [column[0] for column in cur.fetchall()]
+
+    if "phone" not in existing_user_columns:
+        cur.execute("ALTER TABLE users ADD COLUMN phone VARCHAR(50)")
+        print("Added phone column to users table")
+
+def _create_procedure_registry(cur):
+    """Track deployed stored procedure checksums (see create_procedures.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS procedure_registry (
+            name VARCHAR(64) PRIMARY KEY,
+            checksum CHAR(64) NOT NULL,
+            deployed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+def _create_item_thumbnails(cur):
+    """Pre-encoded image thumbnails per item and variant (see thumbnails.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS item_thumbnails (
+            item_id INT NOT NULL,
+            variant VARCHAR(20) NOT NULL,
+            format VARCHAR(10) NOT NULL,
+            width INT NOT NULL,
+            height INT NOT NULL,
+            source_hash CHAR(64) NOT NULL,
+            data MEDIUMBLOB NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (item_id, variant),
+            FOREIGN KEY (item_id) REFERENCES items(item_id) ON DELETE CASCADE
+        );
+    """)
+
+def _create_items_fulltext_index(cur):
+    """FULLTEXT index backing keyword search (see search.py)."""
+    cur.execute("SHOW INDEX FROM items WHERE Key_name = 'items_title_description_ft'")
+    if not cur.fetchall():
+        cur.execute("CREATE FULLTEXT INDEX items_title_description_ft ON items(title, description)")
+
+def _create_item_rollups(cur):
+    """Daily report rollups and the triggers that mark changed days (see rollups.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS item_daily_rollup (
+            day DATE NOT NULL,
+            category_id INT NOT NULL,
+            condition_status VARCHAR(50) NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            seller_id INT NOT NULL,
+            price_bucket TINYINT NOT NULL,
+            item_count INT NOT NULL,
+            priced_count INT NOT NULL,
+            price_sum DECIMAL(14, 2) NOT NULL,
+            price_min DECIMAL(10, 2),
+            price_max DECIMAL(10, 2),
+            first_created_at DATETIME NOT NULL,
+            last_created_at DATETIME NOT NULL,
+            PRIMARY KEY (day, category_id, condition_status, status, seller_id, price_bucket),
+            KEY item_daily_rollup_seller_idx (seller_id)
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_dirty_days (
+            day DATE PRIMARY KEY
+        );
+    """)
+
+    # Mark the created_at day of every written item; refresh_rollups() recomputes those days
+    cur.execute("DROP TRIGGER IF EXISTS items_rollup_insert")
+    cur.execute("""
+        CREATE TRIGGER items_rollup_insert AFTER INSERT ON items FOR EACH ROW
+        INSERT IGNORE INTO rollup_dirty_days (day)
+        SELECT DATE(NEW.created_at) FROM DUAL WHERE NEW.created_at IS NOT NULL
+    """)
+
+    cur.execute("DROP TRIGGER IF EXISTS items_rollup_update")
+    cur.execute("""
+        CREATE TRIGGER items_rollup_update AFTER UPDATE ON items FOR EACH ROW
+        BEGIN
+            -- Image and text edits do not affect the rollups
+            IF NOT (OLD.created_at <=> NEW.created_at AND OLD.category_id <=> NEW.category_id
+                    AND OLD.condition_status <=> NEW.condition_status AND OLD.status <=> NEW.status
+                    AND OLD.seller_id <=> NEW.seller_id AND OLD.price <=> NEW.price) THEN
+                INSERT IGNORE INTO rollup_dirty_days (day)
+                SELECT DATE(OLD.created_at) FROM DUAL WHERE OLD.created_at IS NOT NULL;
+                INSERT IGNORE INTO rollup_dirty_days (day)
+                SELECT DATE(NEW.created_at) FROM DUAL WHERE NEW.created_at IS NOT NULL;
+            END IF;
+        END
+    """)
+
+    cur.execute("DROP TRIGGER IF EXISTS items_rollup_delete")
+    cur.execute("""
+        CREATE TRIGGER items_rollup_delete AFTER DELETE ON items FOR EACH ROW
+        INSERT IGNORE INTO rollup_dirty_days (day)
+        SELECT DATE(OLD.created_at) FROM DUAL WHERE OLD.created_at IS NOT NULL
+    """)
+
+    # Existing items are rolled up by the first refresh
+    cur.execute("""
+        INSERT IGNORE INTO rollup_dirty_days (day)
+        SELECT DISTINCT DATE(created_at) FROM items WHERE created_at IS NOT NULL
+    """)
+
+def _create_transaction_history_indexes(cur):
+    """Seller/buyer + date indexes for get_transaction_history (see transaction_queries.py)."""
+    indexes = [
+        ("transactions_seller_date_idx", "CREATE INDEX transactions_seller_date_idx ON transactions(seller_id, transaction_date)"),
+        ("transactions_buyer_date_idx", "CREATE INDEX transactions_buyer_date_idx ON transactions(buyer_id, transaction_date)"),
+        ("transaction_date_idx", "CREATE INDEX transaction_date_idx ON transactions(transaction_date)"),
+    ]
+    for name, sql in indexes:
+        # transaction_date_idx may already exist from create_indexes.py
+        cur.execute("SHOW INDEX FROM transactions WHERE Key_name = %s", (name,))
+        if not cur.fetchall():
+            cur.execute(sql)
+
+def _add_item_version(cur):
+    """Row version for optimistic concurrency (see transaction_manager.ConcurrencyMode)."""
+    cur.execute("SHOW COLUMNS FROM items LIKE 'version'")
+    if not cur.fetchall():
+        cur.execute("ALTER TABLE items ADD COLUMN version INT NOT NULL DEFAULT 0")
+
+def _roll_up_undated_items(cur):
+    """Mark items without created_at under rollups.UNDATED_DAY instead of skipping them."""
+    # Spelled out rather than imported: a released migration must not change
+    undated_day = "'1000-01-01'"
+    cur.execute("""
+        ALTER TABLE item_daily_rollup
+            MODIFY first_created_at DATETIME NULL,
+            MODIFY last_created_at DATETIME NULL
+    """)
+
+    cur.execute("DROP TRIGGER IF EXISTS items_rollup_insert")
+    cur.execute(f"""
+        CREATE TRIGGER items_rollup_insert AFTER INSERT ON items FOR EACH ROW
+        INSERT IGNORE INTO rollup_dirty_days (day)
+        VALUES (COALESCE(DATE(NEW.created_at), {undated_day}))
+    """)
+
+    cur.execute("DROP TRIGGER IF EXISTS items_rollup_update")
+    cur.execute(f"""
+        CREATE TRIGGER items_rollup_update AFTER UPDATE ON items FOR EACH ROW
+        BEGIN
+            -- Image and text edits do not affect the rollups
+            IF NOT (OLD.created_at <=> NEW.created_at AND OLD.category_id <=> NEW.category_id
+                    AND OLD.condition_status <=> NEW.condition_status AND OLD.status <=> NEW.status
+                    AND OLD.seller_id <=> NEW.seller_id AND OLD.price <=> NEW.price) THEN
+                INSERT IGNORE INTO rollup_dirty_days (day)
+                VALUES (COALESCE(DATE(OLD.created_at), {undated_day})),
+                       (COALESCE(DATE(NEW.created_at), {undated_day}));
+            END IF;
+        END
+    """)
+
+    cur.execute("DROP TRIGGER IF EXISTS items_rollup_delete")
+    cur.execute(f"""
+        CREATE TRIGGER items_rollup_delete AFTER DELETE ON items FOR EACH ROW
+        INSERT IGNORE INTO rollup_dirty_days (day)
+        VALUES (COALESCE(DATE(OLD.created_at), {undated_day}))
+    """)
+
+    # Existing undated items are rolled up by the next refresh
+    cur.execute(f"""
+        INSERT IGNORE INTO rollup_dirty_days (day)
+        SELECT {undated_day} FROM DUAL WHERE EXISTS (SELECT 1 FROM items WHERE created_at IS NULL)
+    """)
+
+def _drop_browser_unsafe_thumbnails(cur):
+    """Remove WEBP thumbnails, which st.image re-encodes; the migrate CLI re-renders them."""
+    cur.execute("DELETE FROM item_thumbnails WHERE format NOT IN ('JPEG', 'PNG')")
+
+def _add_item_has_image(cur):
+    """Stored has_image flag, so listings never reference the image_data BLOB."""
+    cur.execute("SHOW COLUMNS FROM items LIKE 'has_image'")
+    if not cur.fetchall():
+        # A stored generated column is kept up to date by every write path
+        cur.execute("""
+            ALTER TABLE items
+            ADD COLUMN has_image TINYINT(1) AS (image_data IS NOT NULL) STORED NOT NULL
+        """)
+
+# Ordered list of (version, description, function). Append only.
+MIGRATIONS = [
+    (1, "Base schema and seed data", _create_base_schema),
+    (2, "Legacy column upgrades", _upgrade_legacy_columns),
+    (3, "Stored procedure registry", _create_procedure_registry),
+    (4, "Item image thumbnails", _create_item_thumbnails),
+    (5, "Full-text index on item title and description", _create_items_fulltext_index),
+    (6, "Daily report rollups", _create_item_rollups),
+    (7, "Transaction history seller/buyer + date indexes", _create_transaction_history_indexes),
+    (8, "Item row version for optimistic concurrency", _add_item_version),
+    (9, "Roll up items without created_at", _roll_up_undated_items),
+    (10, "Re-render thumbnails as JPEG/PNG", _drop_browser_unsafe_thumbnails),
+    (11, "Stored has_image flag on items", _add_item_has_image),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _ensure_database():
+    """Create the database and the schema_version table if they do not exist."""
+    con = mysql.connector.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+    cur = con.cursor()
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME};")
+    cur.execute(f"USE {DB_NAME};")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    con.commit()
+    cur.close()
+    con.close()
+
+def get_schema_version(cur):
+    """
+    Return the highest applied migration version, or 0 for a fresh database.
+
+    Args:
+        cur: An open cursor on the application database
+    """
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+def migrate(target_version=None):
+    """
+    Apply every pending migration in order, up to target_version.
+
+    This is a deploy-time operation; it must not be called on the request path.
+
+    Args:
+        target_version: Stop after this version (defaults to the latest)
+
+    Returns:
+        int: The schema version after migrating
+    """
+    target_version = LATEST_VERSION if target_version is None else target_version
+    _ensure_database()
+
+    con = get_pooled_connection()
+    cur = con.cursor()
+    try:
+        current_version = get_schema_version(cur)
+        applied = False
+        for version, description, step in MIGRATIONS:
+            if version <= current_version or version > target_version:
+                continue
+            print(f"Applying migration {version}: {description}")
+            step(cur)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            con.commit()
+            current_version = version
+            applied = True
+        if applied:
+            # Migrations may seed or reshape categories; reload the catalogs
+            # that share the cache (only reaches other processes with redis)
+            invalidate(CATEGORIES)
+        print(f"Database schema is at version {current_version}")
+        return current_version
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        cur.close()
+        con.close()
+
+_schema_verified = False
+
+def schema_is_current():
+    """
+    Cheap startup check that the database has every migration applied.
+
+    Runs a single SELECT the first time it succeeds and is a no-op for the
+    rest of the process. Never issues DDL.
+
+    Returns:
+        bool: True if the schema is at LATEST_VERSION
+    """
+    global _schema_verified
+    if _schema_verified:
+        return True
+
+    try:
+        # The pool raises SQLAlchemy errors when the server is unreachable
+        con = get_pooled_connection()
+        try:
+            cur = con.cursor()
+            current_version = get_schema_version(cur)
+            cur.close()
+        finally:
+            con.close()
+    except (mysql.connector.Error, SQLAlchemyError) as e:
+        logger.warning("Could not read schema version: %s", e)
+        return False
+
+    if current_version < LATEST_VERSION:
+        logger.warning(
+            "Database schema is at version %s, expected %s. "
+            "Run `python -m database.migrations` to upgrade.",
+            current_version, LATEST_VERSION
+        )
+        return False
+
+    _schema_verified = True
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage SecondHand Market schema migrations")
+    parser.add_argument("command", nargs="?", default="migrate", choices=["migrate", "status"])
+    parser.add_argument("--target", type=int, default=None, help="Migrate up to this version")
+    parser.add_argument("--skip-procedures", action="store_true",
+                        help="Do not deploy changed stored procedures after migrating")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        _ensure_database()
+        con = get_pooled_connection()
+        cur = con.cursor()
+        current_version = get_schema_version(cur)
+        cur.close()
+        con.close()
+        print(f"Current schema version: {current_version}")
+        print(f"Latest schema version:  {LATEST_VERSION}")
+        for version, description, _ in MIGRATIONS:
+            state = "applied" if version <= current_version else "pending"
+            print(f"  {version:>3}  {state:<8} {description}")
+    else:
+        migrate(args.target)
+        if not args.skip_procedures:
+            # Imported here to avoid a circular import through db_setup
+            from database.create_procedures import deploy_procedures
+            deploy_procedures()
+        from database.rollups import refresh_rollups
+        refresh_rollups()
+        # Items left without thumbnails, e.g. by migration 10
+        from database.thumbnails import backfill_thumbnails
+        backfill_thumbnails()
+
+if __name__ == "__main__":
+    main()
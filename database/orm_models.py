@@ -1,24 +1,13 @@
-from sqlalchemy import create_engine, Column, Integer, String, Numeric, DateTime, Text, ForeignKey, LargeBinary
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Text, ForeignKey, LargeBinary, Boolean, Computed
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship, backref
-import os
+from sqlalchemy.orm import relationship, backref, deferred
 from datetime import datetime
-from database.db_setup import DB_NAME
-import urllib.parse
+from database.connection_pool import engine
+from database.sessions import SessionFactory
 
-# Define your MySQL connection string
-# Get MySQL credentials from environment or use defaults
-DB_HOST = os.environ.get('DB_HOST', 'localhost')
-DB_USER = os.environ.get('DB_USER', 'root')
-DB_PASSWORD = os.environ.get('DB_PASSWORD', 'Kkhiladi@420')
-
-# URL encode the password to handle special characters like @
-encoded_password = urllib.parse.quote_plus(DB_PASSWORD)
-
-# Create SQLAlchemy engine and session
-connection_string = f"mysql+mysqlconnector://{DB_USER}:{encoded_password}@{DB_HOST}/{DB_NAME}"
-engine = create_engine(connection_string)
-Session = sessionmaker(bind=engine)
+# Sessions share the process-wide pooled engine with get_connection();
+# pages should prefer the scoped session helpers in sessions.py
+Session = SessionFactory
 
 # Create base class for models
 Base = declarative_base()
@@ -77,16 +66,41 @@ class Item(Base):
     category_id = Column(Integer, ForeignKey('categories.category_id'))
     contact_preference = Column(String(50))
     location = Column(String(255))
-    image_data = Column(LargeBinary)
+    # Deferred so queries on Item never load the BLOB unless it is accessed
+    image_data = deferred(Column(LargeBinary))
+    # Maintained by MySQL on every write (migration 11); read instead of image_data
+    has_image = Column(Boolean, Computed("image_data IS NOT NULL", persisted=True))
+    # Bumped by every status/content update; checked by optimistic updates
+    version = Column(Integer, nullable=False, default=0)
     
     # Relationships
     seller = relationship("User", back_populates="items")
     category = relationship("Category", back_populates="items")
     transactions = relationship("Transaction", back_populates="item")
+    thumbnails = relationship("ItemThumbnail", back_populates="item", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Item(item_id={self.item_id}, title='{self.title}', price={self.price})>"
 
+class ItemThumbnail(Base):
+    """ORM model for the item_thumbnails table"""
+    __tablename__ = 'item_thumbnails'
+    
+    item_id = Column(Integer, ForeignKey('items.item_id', ondelete='CASCADE'), primary_key=True)
+    variant = Column(String(20), primary_key=True)
+    format = Column(String(10), nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    source_hash = Column(String(64), nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+    created_at = Column(DateTime, default=datetime.now)
+    
+    # Relationships
+    item = relationship("Item", back_populates="thumbnails")
+    
+    def __repr__(self):
+        return f"<ItemThumbnail(item_id={self.item_id}, variant='{self.variant}')>"
+
 class Transaction(Base):
     """ORM model for the transactions table"""
     __tablename__ = 'transactions'
@@ -0,0 +1,204 @@
+# secondhand_market/database/pagination.py
+"""
+Keyset (seek) pagination for the browse page.
+
+Instead of LIMIT/OFFSET, each page starts strictly after (or before) the
+sort key of the last (or first) row of the previous page, with item_id as
+a tie-breaker, e.g. for "Newest first":
+
+    WHERE i.created_at <= %s AND (i.created_at < %s OR i.item_id < %s)
+    ORDER BY i.created_at DESC, i.item_id DESC
+    LIMIT page_size + 1
+
+so every page costs an index range scan no matter how deep it is. Rows
+with a NULL sort key (price and created_at are nullable) are sought
+separately, in the place MySQL's ORDER BY puts them. The
+position is carried between reruns as an opaque URL-safe page token.
+Relevance ("Best match") ordering has no stable column to seek on, so it
+falls back to an offset stored in the token.
+"""
+
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+
+# Sort label -> (column, direction). The column is always paired with item_id.
+SORT_ORDERS = {
+    "Newest first": ("created_at", "DESC"),
+    "Oldest first": ("created_at", "ASC"),
+    "Price: Low to High": ("price", "ASC"),
+    "Price: High to Low": ("price", "DESC"),
+    "A-Z": ("title", "ASC"),
+    "Z-A": ("title", "DESC"),
+}
+
+# Token directions
+AFTER = "after"
+BEFORE = "before"
+
+def filter_fingerprint(*params):
+    """Return a short hash of the active filters so stale tokens can be detected."""
+    raw = json.dumps([str(p) for p in params])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+def _serialize(value):
+    if isinstance(value, datetime.datetime):
+        return {"t": "dt", "v": value.isoformat(sep=" ")}
+    if isinstance(value, decimal.Decimal):
+        return {"t": "dec", "v": str(value)}
+    return {"t": "str", "v": value}
+
+def _deserialize(data):
+    if data["t"] == "dt":
+        return datetime.datetime.fromisoformat(data["v"])
+    if data["t"] == "dec":
+        return decimal.Decimal(data["v"])
+    return data["v"]
+
+def encode_page_token(sort_label, filter_key, direction, page, row=None, offset=None):
+    """
+    Build an opaque page token.
+
+    Args:
+        sort_label: Key of SORT_ORDERS (or any label for offset tokens)
+        filter_key: filter_fingerprint() of the active filters
+        direction: AFTER or BEFORE the row
+        page: 1-based number of the page the token leads to (for display)
+        row: Boundary row for keyset tokens
+        offset: Row offset for relevance-ordered tokens
+
+    Returns:
+        str: URL-safe token
+    """
+    payload = {"s": sort_label, "f": filter_key, "d": direction, "p": page}
+    if offset is not None:
+        payload["o"] = offset
+    else:
+        column, _ = SORT_ORDERS[sort_label]
+        payload["k"] = _serialize(row[column])
+        payload["id"] = row["item_id"]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_page_token(token, sort_label, filter_key):
+    """
+    Decode a page token, rejecting tokens from a different sort or filter set.
+
+    Returns:
+        dict or None: {"direction", "page", "value", "item_id"} or
+        {"direction", "page", "offset"}; None means start from the first page
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload["s"] != sort_label or payload["f"] != filter_key:
+            return None
+        page = max(1, int(payload["p"]))
+        if "o" in payload:
+            return {"direction": payload["d"], "page": page, "offset": max(0, int(payload["o"]))}
+        return {
+            "direction": payload["d"],
+            "page": page,
+            "value": _deserialize(payload["k"]),
+            "item_id": int(payload["id"]),
+        }
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def seek_direction(sort_label, position):
+    """
+    Return the SQL direction to scan in for this page.
+
+    Pages requested BEFORE a row are read in reverse and flipped back by
+    finish_page().
+    """
+    _, direction = SORT_ORDERS[sort_label]
+    if position and position["direction"] == BEFORE:
+        return "ASC" if direction == "DESC" else "DESC"
+    return direction
+
+def keyset_clause(sort_label, position):
+    """
+    Build the seek predicate and ORDER BY for the ad-hoc query path.
+
+    Args:
+        sort_label: Key of SORT_ORDERS
+        position: Result of decode_page_token(), or None for the first page
+
+    Returns:
+        tuple: (where_sql, params, order_sql)
+    """
+    column, _ = SORT_ORDERS[sort_label]
+    direction = seek_direction(sort_label, position)
+    order_sql = f"i.{column} {direction}, i.item_id {direction}"
+    if not position:
+        return "", [], order_sql
+
+    op = "<" if direction == "DESC" else ">"
+    value = position["value"]
+    # price and created_at are nullable. MySQL sorts NULLs first ascending
+    # and last descending, and a comparison with NULL matches nothing, so
+    # NULL rows get their own branches.
+    if value is None:
+        if direction == "ASC":
+            # The remaining NULL rows, then every non-NULL row
+            where_sql = f" AND (i.{column} IS NULL AND i.item_id > %s OR i.{column} IS NOT NULL)"
+        else:
+            # Only NULL rows are left
+            where_sql = f" AND i.{column} IS NULL AND i.item_id < %s"
+        return where_sql, [position["item_id"]], order_sql
+
+    # Written as a range on the sort column so the optimizer can seek the index
+    where_sql = f"i.{column} {op}= %s AND (i.{column} {op} %s OR i.item_id {op} %s)"
+    if direction == "DESC":
+        # NULL rows come after every non-NULL row
+        where_sql = f"({where_sql} OR i.{column} IS NULL)"
+    return f" AND {where_sql}", [value, value, position["item_id"]], order_sql
+
+def finish_page(rows, sort_label, filter_key, position, page_size):
+    """
+    Trim a page fetched with LIMIT page_size + 1 and build prev/next tokens.
+
+    Args:
+        rows: Rows fetched in seek order (page_size + 1 at most)
+        sort_label: Key of SORT_ORDERS
+        filter_key: filter_fingerprint() of the active filters
+        position: Result of decode_page_token(), or None for the first page
+        page_size: Rows shown per page
+
+    Returns:
+        tuple: (rows in display order, page number, prev_token or None, next_token or None)
+    """
+    page = position["page"] if position else 1
+    has_more = len(rows) > page_size
+    rows = list(rows[:page_size])
+
+    if position and position["direction"] == BEFORE:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = position is not None, has_more
+
+    if not rows:
+        return rows, page, None, None
+    prev_token = (encode_page_token(sort_label, filter_key, BEFORE, page - 1, row=rows[0])
+                  if has_prev else None)
+    next_token = (encode_page_token(sort_label, filter_key, AFTER, page + 1, row=rows[-1])
+                  if has_next else None)
+    return rows, page, prev_token, next_token
+
+def finish_offset_page(rows, sort_label, filter_key, position, page_size):
+    """Offset-token counterpart of finish_page() for relevance ordering."""
+    offset = position["offset"] if position else 0
+    page = position["page"] if position else 1
+    has_more = len(rows) > page_size
+    rows = list(rows[:page_size])
+    prev_token = (encode_page_token(sort_label, filter_key, AFTER, page - 1, offset=max(0, offset - page_size))
+                  if offset > 0 else None)
+    next_token = (encode_page_token(sort_label, filter_key, AFTER, page + 1, offset=offset + page_size)
+                  if has_more else None)
+    return rows, page, prev_token, next_token
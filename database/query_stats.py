@@ -0,0 +1,314 @@
+# secondhand_market/database/query_stats.py
+"""
+Per-statement query instrumentation and slow-query log.
+
+Every connection handed out by get_connection() is wrapped so its cursors
+record, for each statement: the time spent executing it and fetching its
+results, rows returned (or affected), approximate bytes sent and received,
+and the call site (first frame outside the database plumbing). ORM queries
+are recorded through SQLAlchemy engine events; their fetch time and
+received bytes are not included.
+
+Statements are aggregated by normalized SQL (literals replaced with ?) and
+call site; get_query_stats() returns the top N by total time. Statements
+slower than DB_SLOW_QUERY_MS are logged to the "database.slow_queries"
+logger and kept in a short list for get_slow_queries().
+
+Configuration through environment variables:
+
+    DB_QUERY_STATS        "1" to instrument (default), "0" to hand out plain connections
+    DB_SLOW_QUERY_MS      Slow-query threshold in milliseconds (default 200)
+    DB_QUERY_STATS_MAX    Distinct statements tracked (default 500)
+"""
+
+import collections
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from sqlalchemy import event
+
+slow_query_logger = logging.getLogger("database.slow_queries")
+
+QUERY_STATS_ENABLED = os.environ.get('DB_QUERY_STATS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 200))
+MAX_STATEMENTS = int(os.environ.get('DB_QUERY_STATS_MAX', 500))
+
+# Recent slow queries kept for the admin page
+SLOW_QUERY_HISTORY = 100
+
+# Frames from these modules are plumbing, not call sites: the cache loader,
+# pool, retry wrapper and session helpers run queries on a caller's behalf
+_PLUMBING_MODULES = ("query_stats", "cache", "connection_pool", "transaction_manager", "sessions")
+_PLUMBING_FILES = tuple(os.path.join(os.path.dirname(__file__), name + ".py") for name in _PLUMBING_MODULES)
+_PLUMBING_DIRS = (f"{os.sep}sqlalchemy{os.sep}", f"{os.sep}mysql{os.sep}", f"{os.sep}contextlib.py")
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+_stats_lock = threading.Lock()
+_statements = {}
+_slow_queries = collections.deque(maxlen=SLOW_QUERY_HISTORY)
+_dropped = 0
+
+def normalize_sql(sql):
+    """Collapse literals and whitespace so executions of one statement aggregate together."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode("utf-8", "replace")
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_PLUMBING_FILES) and not any(part in filename for part in _PLUMBING_DIRS):
+            return f"{os.path.relpath(filename)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "?"
+
+def _value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    return 8
+
+def _row_size(row):
+    values = row.values() if isinstance(row, dict) else row
+    return sum(_value_size(value) for value in values)
+
+def _params_size(params):
+    if not params:
+        return 0
+    if isinstance(params, dict):
+        params = params.values()
+    return sum(_value_size(value) for value in params)
+
+def record_query(sql, elapsed, rows=0, bytes_sent=0, bytes_received=0, call_site="?"):
+    """
+    Add one statement execution to the aggregated stats and log it if slow.
+
+    Args:
+        sql: Statement text as executed
+        elapsed: Seconds spent executing and fetching
+        rows: Rows returned or affected
+        bytes_sent: Approximate size of the statement and its parameters
+        bytes_received: Approximate size of the fetched rows
+        call_site: "file:line (function)" that issued the statement
+    """
+    global _dropped
+    statement = normalize_sql(sql)
+    elapsed_ms = elapsed * 1000
+    slow = elapsed_ms >= SLOW_QUERY_MS
+
+    with _stats_lock:
+        key = (statement, call_site)
+        entry = _statements.get(key)
+        if entry is None:
+            if len(_statements) >= MAX_STATEMENTS:
+                _dropped += 1
+            else:
+                entry = _statements[key] = {
+                    "statement": statement, "call_site": call_site, "calls": 0, "slow_calls": 0,
+                    "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "bytes_sent": 0, "bytes_received": 0,
+                }
+        if entry is not None:
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] += rows
+            entry["bytes_sent"] += bytes_sent
+            entry["bytes_received"] += bytes_received
+            if slow:
+                entry["slow_calls"] += 1
+        if slow:
+            _slow_queries.append({
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"), "elapsed_ms": elapsed_ms, "rows": rows,
+                "call_site": call_site, "statement": statement,
+            })
+
+    if slow:
+        slow_query_logger.warning("Slow query (%.1f ms, %d rows) at %s: %s",
+                                  elapsed_ms, rows, call_site, statement)
+
+def get_query_stats(top=20, order_by="total_ms"):
+    """
+    Return the top statements by an aggregate for monitoring.
+
+    Args:
+        top: Number of statements to return, or None for all
+        order_by: total_ms, avg_ms, max_ms, calls, rows, bytes_received or slow_calls
+
+    Returns:
+        list: One dict per statement and call site, including avg_ms
+    """
+    with _stats_lock:
+        entries = [dict(entry) for entry in _statements.values()]
+    for entry in entries:
+        entry["avg_ms"] = entry["total_ms"] / entry["calls"] if entry["calls"] else 0.0
+    entries.sort(key=lambda entry: entry[order_by], reverse=True)
+    return entries[:top] if top is not None else entries
+
+def get_slow_queries():
+    """Return the most recent slow queries, newest first."""
+    with _stats_lock:
+        return list(reversed(_slow_queries))
+
+def get_query_totals():
+    """
+    Return totals over every recorded statement.
+
+    Returns:
+        dict: statements, calls, slow_calls, total_ms and dropped (executions of
+        statements not tracked because MAX_STATEMENTS was reached)
+    """
+    with _stats_lock:
+        entries = list(_statements.values())
+        return {
+            "statements": len(entries),
+            "calls": sum(entry["calls"] for entry in entries),
+            "slow_calls": sum(entry["slow_calls"] for entry in entries),
+            "total_ms": sum(entry["total_ms"] for entry in entries),
+            "dropped": _dropped,
+        }
+
+def reset_query_stats():
+    """Forget every recorded statement and slow query."""
+    global _dropped
+    with _stats_lock:
+        _statements.clear()
+        _slow_queries.clear()
+        _dropped = 0
+
+class InstrumentedCursor:
+    """
+    DB-API cursor wrapper that times statements and counts their rows and bytes.
+
+    A statement is recorded when the next statement starts or the cursor is
+    closed, so the fetches (and nextset() calls) in between count towards it.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pending = None
+
+    def _start(self, operation, params, call_site):
+        self._finish()
+        self._pending = {
+            "sql": operation, "elapsed": 0.0, "rows": 0, "fetched": False,
+            "bytes_sent": len(operation) + _params_size(params), "bytes_received": 0,
+            "call_site": call_site,
+        }
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        rows = pending["rows"] if pending["fetched"] else max(getattr(self._cursor, "rowcount", 0) or 0, 0)
+        record_query(pending["sql"], pending["elapsed"], rows, pending["bytes_sent"],
+                     pending["bytes_received"], pending["call_site"])
+
+    def _timed(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            if self._pending is not None:
+                self._pending["elapsed"] += time.perf_counter() - started
+
+    def _fetched(self, rows):
+        if self._pending is not None:
+            self._pending["fetched"] = True
+            self._pending["rows"] += len(rows)
+            self._pending["bytes_received"] += sum(_row_size(row) for row in rows)
+        return rows
+
+    def execute(self, operation, *args, **kwargs):
+        params = args[0] if args else kwargs.get("params")
+        self._start(operation, params, _call_site())
+        return self._timed(self._cursor.execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        seq_params = list(seq_params)
+        self._start(operation, None, _call_site())
+        self._pending["bytes_sent"] += sum(_params_size(params) for params in seq_params)
+        return self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None:
+            self._fetched([row])
+        elif self._pending is not None:
+            self._pending["fetched"] = True
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        return self._fetched(self._timed(self._cursor.fetchmany, *args, **kwargs))
+
+    def fetchall(self):
+        return self._fetched(self._timed(self._cursor.fetchall))
+
+    def nextset(self):
+        return self._timed(self._cursor.nextset)
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """Connection wrapper whose cursors are InstrumentedCursors; everything else is delegated."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+def instrument_connection(connection):
+    """Wrap a raw connection for instrumentation, unless DB_QUERY_STATS=0."""
+    return InstrumentedConnection(connection) if QUERY_STATS_ENABLED else connection
+
+def instrument_engine(engine):
+    """Record the statements a SQLAlchemy engine (i.e. the ORM) executes, unless DB_QUERY_STATS=0."""
+    if not QUERY_STATS_ENABLED:
+        return
+
+    # The start time is kept on the execution context, so a statement that
+    # fails (and never reaches after_cursor_execute) leaves nothing behind.
+    # Internal executions without a context use a per-connection slot that
+    # the next statement overwrites.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+        else:
+            conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            started = getattr(context, "_query_started", None)
+        else:
+            started = conn.info.pop("query_started", None)
+        if started is None:
+            return
+        if executemany:
+            bytes_sent = len(statement) + sum(_params_size(params) for params in parameters)
+        else:
+            bytes_sent = len(statement) + _params_size(parameters)
+        record_query(statement, time.perf_counter() - started, max(cursor.rowcount or 0, 0),
+                     bytes_sent, 0, _call_site())
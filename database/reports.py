@@ -0,0 +1,56 @@
+# secondhand_market/database/reports.py
+"""
+Combined data loader for the Reports dashboard.
+
+load_report_data() fetches every dashboard aggregate with a single
+CALL get_report_data(...) over one connection. The procedure reads the
+daily rollups (see rollups.py) and returns one result set per section, which
+are collected into a ReportData record that the report tabs render from.
+"""
+
+from collections import namedtuple
+from database.transaction_manager import transaction, IsolationLevel
+
+# Result sets of get_report_data, in the order the procedure returns them
+REPORT_SECTIONS = ("overview", "categories", "conditions", "price_buckets", "monthly", "sellers")
+
+ReportData = namedtuple("ReportData", REPORT_SECTIONS)
+ReportData.__doc__ = """
+Aggregates shown on the Reports dashboard.
+
+    overview       dict: total_items, available_count, sold_count, avg_price (selected period)
+    categories     list of dicts: category, item_count, avg_price, sold_count (selected period)
+    conditions     list of dicts: condition_status, avg_price, min_price, max_price, item_count
+    price_buckets  list of dicts: price_range, item_count
+    monthly        list of dicts: month, item_count, avg_price, sold_count (last 12 months)
+    sellers        list of dicts: username, item_count, sold_count, avg_price,
+                   first_listing, last_listing
+"""
+
+def load_report_data(start_date=None, end_date=None):
+    """
+    Load every Reports dashboard aggregate in one round trip.
+
+    Args:
+        start_date: First day of the report period ('YYYY-MM-DD'), or None for all time
+        end_date: Last day of the report period ('YYYY-MM-DD'), or None for all time
+
+    Returns:
+        ReportData: One attribute per dashboard section
+    """
+    with transaction(IsolationLevel.READ_COMMITTED) as (conn, cursor):
+        cursor.execute("CALL get_report_data(%s, %s)", [start_date, end_date])
+        result_sets = [cursor.fetchall()]
+        # Collect the remaining result sets; the final status result has no rows
+        while cursor.nextset():
+            if cursor.description is not None:
+                result_sets.append(cursor.fetchall())
+
+    if len(result_sets) != len(REPORT_SECTIONS):
+        raise RuntimeError(
+            f"get_report_data returned {len(result_sets)} result sets, expected {len(REPORT_SECTIONS)}. "
+            "Run `python -m database.create_procedures` to deploy the current procedure."
+        )
+
+    overview, *sections = result_sets
+    return ReportData(overview[0] if overview else {}, *sections)
@@ -0,0 +1,181 @@
+# secondhand_market/database/rollups.py
+"""
+Daily report rollups.
+
+The Reports page reads item_daily_rollup, which holds one row per
+(day, category, condition, status, seller, price bucket) with the item
+count and price aggregates, instead of scanning items on every rerun.
+
+Rollups are maintained incrementally: triggers on items (migration 6) record
+the created_at day of every inserted, changed or deleted item in
+rollup_dirty_days, and refresh_rollups() recomputes only those days from
+items. Items without a created_at are rolled up under UNDATED_DAY, so
+all-time reports count them and date-filtered reports leave them out, as
+queries on items do.
+
+Refreshing writes under a named lock, so it never runs on the request
+path: the Reports page only reads the rollups and shows how stale they are
+(get_rollup_staleness()). Migrations and the bulk loader refresh after
+their writes; otherwise run the CLI from cron or as a background worker:
+
+    python -m database.rollups               # refresh dirty days
+    python -m database.rollups --full        # recompute every day
+    python -m database.rollups --every 60    # refresh every 60 seconds until stopped
+"""
+
+import argparse
+import datetime
+import logging
+import time
+from database.db_setup import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Price bucket labels, indexed by price_bucket. The bounds mirror the original
+# price_distribution report (BETWEEN is inclusive, the first match wins).
+PRICE_BUCKETS = ["$0-$10", "$10-$25", "$25-$50", "$50-$100", "$100-$250", "$250-$500", "$500+", "Unknown"]
+
+PRICE_BUCKET_SQL = """
+    CASE
+        WHEN price BETWEEN 0 AND 10 THEN 0
+        WHEN price BETWEEN 10 AND 25 THEN 1
+        WHEN price BETWEEN 25 AND 50 THEN 2
+        WHEN price BETWEEN 50 AND 100 THEN 3
+        WHEN price BETWEEN 100 AND 250 THEN 4
+        WHEN price BETWEEN 250 AND 500 THEN 5
+        WHEN price > 500 THEN 6
+        ELSE 7
+    END
+"""
+
+# Rollup day of items whose created_at is NULL; before any real date
+UNDATED_DAY = datetime.date(1000, 1, 1)
+
+# Named lock so concurrent report viewers do not refresh the same days twice
+REFRESH_LOCK = "item_daily_rollup_refresh"
+
+def _refresh_day(con, cur, day):
+    """Recompute the rollup rows of one day in a single transaction."""
+    con.start_transaction()
+    try:
+        # Clear the mark first: a write committed while we recompute marks the day again
+        cur.execute("DELETE FROM rollup_dirty_days WHERE day = %s", (day,))
+        cur.execute("DELETE FROM item_daily_rollup WHERE day = %s", (day,))
+        if day == UNDATED_DAY:
+            day_filter, day_params = "created_at IS NULL", ()
+        else:
+            day_filter, day_params = "created_at >= %s AND created_at < %s + INTERVAL 1 DAY", (day, day)
+        cur.execute(f"""
+            INSERT INTO item_daily_rollup
+                (day, category_id, condition_status, status, seller_id, price_bucket,
+                 item_count, priced_count, price_sum, price_min, price_max,
+                 first_created_at, last_created_at)
+            SELECT
+                %s,
+                COALESCE(category_id, 0),
+                COALESCE(condition_status, ''),
+                COALESCE(status, ''),
+                COALESCE(seller_id, 0),
+                {PRICE_BUCKET_SQL},
+                COUNT(*),
+                COUNT(price),
+                COALESCE(SUM(price), 0),
+                MIN(price),
+                MAX(price),
+                MIN(created_at),
+                MAX(created_at)
+            FROM items
+            WHERE {day_filter}
+            GROUP BY 1, 2, 3, 4, 5, 6
+        """, (day, *day_params))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+def refresh_rollups(full=False, max_days=None):
+    """
+    Bring item_daily_rollup up to date.
+
+    Args:
+        full: Recompute every day that has items or rollup rows, not only dirty days
+        max_days: Refresh at most this many dirty days (oldest first); None for all
+
+    Returns:
+        int: Number of days refreshed, 0 if another process holds the refresh lock
+    """
+    con = get_connection()
+    cur = con.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, 0)", (REFRESH_LOCK,))
+        if cur.fetchone()[0] != 1:
+            return 0
+        try:
+            if full:
+                cur.execute("""
+                    INSERT IGNORE INTO rollup_dirty_days (day)
+                    SELECT DISTINCT COALESCE(DATE(created_at), %s) FROM items
+                    UNION
+                    SELECT DISTINCT day FROM item_daily_rollup
+                """, (UNDATED_DAY,))
+                con.commit()
+
+            query = "SELECT day FROM rollup_dirty_days ORDER BY day"
+            if max_days is not None:
+                query += f" LIMIT {int(max_days)}"
+            cur.execute(query)
+            days = [row[0] for row in cur.fetchall()]
+            # End the snapshot so each day is recomputed from current data
+            con.commit()
+
+            for day in days:
+                _refresh_day(con, cur, day)
+            if days:
+                logger.info("Refreshed report rollups for %d day(s)", len(days))
+            return len(days)
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (REFRESH_LOCK,))
+            cur.fetchall()
+    finally:
+        cur.close()
+        con.close()
+
+def get_rollup_staleness():
+    """
+    Report how far the rollups lag behind items, with one cheap read.
+
+    Returns:
+        dict: dirty_days (days waiting for a refresh) and oldest_dirty_day
+        (date, or None when no dated day is waiting)
+    """
+    con = get_connection()
+    cur = con.cursor()
+    try:
+        cur.execute("SELECT COUNT(*), MIN(NULLIF(day, %s)) FROM rollup_dirty_days", (UNDATED_DAY,))
+        dirty_days, oldest_dirty_day = cur.fetchone()
+        return {"dirty_days": dirty_days, "oldest_dirty_day": oldest_dirty_day}
+    finally:
+        cur.close()
+        con.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh SecondHand Market report rollups")
+    parser.add_argument("--full", action="store_true", help="Recompute every day, not only dirty days")
+    parser.add_argument("--max-days", type=int, default=None, help="Refresh at most this many days")
+    parser.add_argument("--every", type=float, default=None, metavar="SECONDS",
+                        help="Keep running and refresh dirty days at this interval")
+    args = parser.parse_args()
+
+    full = args.full
+    while True:
+        started = datetime.datetime.now()
+        refreshed = refresh_rollups(full=full, max_days=args.max_days)
+        elapsed = (datetime.datetime.now() - started).total_seconds()
+        print(f"Refreshed {refreshed} day(s) in {elapsed:.2f}s")
+        if args.every is None:
+            break
+        full = False
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# secondhand_market/database/search.py
+"""
+Full-text keyword search over item titles and descriptions.
+
+Searches use the items_title_description_ft FULLTEXT index (migration 5)
+in BOOLEAN MODE: the user's text is tokenized, every usable token becomes
+a required prefix term (+token*), and results are ranked by the MATCH
+relevance score. This replaces LIKE '%q%' predicates, which forced a full
+scan of the TEXT columns.
+"""
+
+import re
+
+# MATCH expression shared by the browse page and the search_items procedure
+MATCH_EXPRESSION = "MATCH(i.title, i.description) AGAINST (%s IN BOOLEAN MODE)"
+
+# Shorter tokens are not indexed by InnoDB (innodb_ft_min_token_size)
+MIN_TOKEN_LENGTH = 3
+
+# InnoDB's default full-text stopword list; requiring these would match nothing
+STOPWORDS = {
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en",
+    "for", "from", "how", "i", "in", "is", "it", "la", "of", "on", "or",
+    "that", "the", "this", "to", "was", "what", "when", "where", "who",
+    "will", "with", "und", "www",
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text):
+    """
+    Split search text into lowercase index tokens.
+
+    Boolean-mode operators and punctuation are discarded, as are stopwords
+    and tokens shorter than MIN_TOKEN_LENGTH.
+
+    Args:
+        text: Raw search text entered by the user
+
+    Returns:
+        list: Unique tokens in input order
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall((text or "").lower()):
+        if len(token) < MIN_TOKEN_LENGTH or token in STOPWORDS or token in tokens:
+            continue
+        tokens.append(token)
+    return tokens
+
+def build_boolean_query(text):
+    """
+    Build a BOOLEAN MODE search string where every token is a required prefix.
+
+    Returns:
+        str or None: e.g. "+nintendo* +swit*", or None if no token is usable
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    return " ".join(f"+{token}*" for token in tokens)
+
+def search_predicate(text):
+    """
+    Build the WHERE fragment for a keyword search.
+
+    Falls back to a title prefix LIKE when the text has no indexable tokens
+    (e.g. "tv"), since MATCH cannot find words shorter than MIN_TOKEN_LENGTH.
+
+    Args:
+        text: Raw search text entered by the user
+
+    Returns:
+        tuple: (where_sql, where_params, order_sql, order_params); order_sql
+        ranks by relevance and is None for the LIKE fallback
+    """
+    boolean_query = build_boolean_query(text)
+    if boolean_query:
+        return f" AND {MATCH_EXPRESSION}", [boolean_query], f"{MATCH_EXPRESSION} DESC", [boolean_query]
+    escaped = text.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return " AND i.title LIKE %s", [f"{escaped}%"], None, []
@@ -0,0 +1,97 @@
+# secondhand_market/database/sessions.py
+"""
+Shared ORM session management.
+
+All sessions come from one sessionmaker bound to the pooled engine in
+connection_pool.py (pool size, recycle and pre-ping are configured there).
+Pages use a scoped session instead of creating and closing ad-hoc ones:
+
+    def app():
+        with page_session():
+            create_item_page()
+
+    def get_user_info(user_id):
+        return current_session().get(User, user_id)
+
+    with unit_of_work(IsolationLevel.SERIALIZABLE) as session:
+        session.add(new_item)
+
+The scope is the thread running the Streamlit script, and page_session()
+removes the session when the run ends, so one page render uses at most one
+session, which holds at most one pooled connection.
+
+Configuration through environment variables:
+
+    DB_SESSION_EXPIRE_ON_COMMIT  "1" to expire loaded objects on commit
+                                 (default "0": objects stay readable after
+                                 commit without another round trip)
+"""
+
+import os
+from contextlib import contextmanager
+from sqlalchemy.orm import scoped_session, sessionmaker
+from database.connection_pool import engine
+
+EXPIRE_ON_COMMIT = os.environ.get('DB_SESSION_EXPIRE_ON_COMMIT', '0') == '1'
+
+# The session factory shared by the whole process
+SessionFactory = sessionmaker(bind=engine, expire_on_commit=EXPIRE_ON_COMMIT)
+
+# One session per thread, i.e. per running Streamlit script
+ScopedSession = scoped_session(SessionFactory)
+
+def current_session():
+    """Return the session of the current script run, creating it on first use."""
+    return ScopedSession()
+
+@contextmanager
+def page_session():
+    """
+    Scope a page render: every current_session() and unit_of_work() inside
+    shares one session, which is closed (returning its connection to the
+    pool) when the block exits.
+    """
+    try:
+        yield current_session()
+    finally:
+        ScopedSession.remove()
+
+@contextmanager
+def unit_of_work(isolation_level=None, expire_on_commit=None):
+    """
+    Run a block of ORM work as one transaction on the current session.
+
+    Commits when the block succeeds and rolls back on error. The session
+    stays open for the rest of the page render.
+
+    Args:
+        isolation_level: IsolationLevel constant for this transaction, or
+            None for the server default
+        expire_on_commit: Override EXPIRE_ON_COMMIT for this commit
+
+    Yields:
+        session: The current scoped session
+
+    Example:
+        with unit_of_work(IsolationLevel.SERIALIZABLE) as session:
+            session.add(Item(title="Example", price=10.99, seller_id=1))
+    """
+    session = current_session()
+    # Reads earlier in the render auto-begin a transaction; end it so the
+    # isolation level applies to a fresh one
+    if session.in_transaction():
+        session.commit()
+    if isolation_level is not None:
+        session.connection(execution_options={"isolation_level": isolation_level})
+
+    previous_expire = session.expire_on_commit
+    if expire_on_commit is not None:
+        session.expire_on_commit = expire_on_commit
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.expire_on_commit = previous_expire
@@ -0,0 +1,188 @@
+# secondhand_market/database/thumbnails.py
+"""
+Thumbnail pipeline for item images.
+
+When an item image is uploaded or replaced, generate_thumbnails() renders
+fixed-size variants (grid card, list row, detail view), which are stored
+in the item_thumbnails table. They are encoded as JPEG, or as PNG when the
+source has transparency: st.image passes JPEG, PNG and GIF bytes to the
+browser unchanged but decodes and re-encodes any other format, so these
+are the formats that keep image decoding off the request path.
+
+Thumbnails for items created before this pipeline existed can be built with:
+
+    python -m database.thumbnails --backfill
+"""
+
+import argparse
+import hashlib
+import io
+from database.db_setup import get_connection
+
+# Variant name -> bounding box (width, height)
+THUMBNAIL_SIZES = {
+    "card": (320, 320),
+    "list": (160, 160),
+    "detail": (800, 800),
+}
+
+# Formats st.image serves as is; PNG only for sources with transparency
+THUMBNAIL_FORMAT = "JPEG"
+THUMBNAIL_ALPHA_FORMAT = "PNG"
+THUMBNAIL_QUALITY = 80
+
+def image_hash(image_bytes):
+    """Return the SHA-256 hex digest of the source image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def generate_thumbnails(image_bytes):
+    """
+    Render every thumbnail variant for an image.
+
+    Args:
+        image_bytes: The original uploaded image
+
+    Returns:
+        dict: variant -> (data, format, width, height)
+    """
+    # Pillow is imported on first use so importing this module stays cheap
+    from PIL import Image, ImageOps
+
+    source = Image.open(io.BytesIO(image_bytes))
+    # Respect camera orientation before the EXIF data is dropped
+    source = ImageOps.exif_transpose(source)
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+    # Fully opaque alpha channels are dropped so the image can be a JPEG
+    if source.mode == "RGBA" and source.getchannel("A").getextrema()[0] == 255:
+        source = source.convert("RGB")
+
+    if source.mode == "RGBA":
+        image_format, save_options = THUMBNAIL_ALPHA_FORMAT, {"optimize": True}
+    else:
+        image_format, save_options = THUMBNAIL_FORMAT, {"quality": THUMBNAIL_QUALITY, "optimize": True}
+
+    thumbnails = {}
+    for variant, size in THUMBNAIL_SIZES.items():
+        image = source.copy()
+        image.thumbnail(size)
+        output = io.BytesIO()
+        image.save(output, format=image_format, **save_options)
+        thumbnails[variant] = (output.getvalue(), image_format, image.width, image.height)
+    return thumbnails
+
+def store_thumbnails(cursor, item_id, image_bytes):
+    """
+    Generate and store thumbnails for an item inside the caller's transaction.
+
+    Passing image_bytes=None removes any stored thumbnails for the item.
+
+    Args:
+        cursor: An open cursor on the application database
+        item_id: ID of the item the image belongs to
+        image_bytes: The original uploaded image
+    """
+    if not image_bytes:
+        cursor.execute("DELETE FROM item_thumbnails WHERE item_id = %s", (item_id,))
+        return
+
+    source_hash = image_hash(image_bytes)
+    rows = [
+        (item_id, variant, image_format, width, height, source_hash, data)
+        for variant, (data, image_format, width, height) in generate_thumbnails(image_bytes).items()
+    ]
+    cursor.executemany("""
+        INSERT INTO item_thumbnails (item_id, variant, format, width, height, source_hash, data)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            format = VALUES(format), width = VALUES(width), height = VALUES(height),
+            source_hash = VALUES(source_hash), data = VALUES(data)
+    """, rows)
+
+def get_thumbnails(item_ids, variant):
+    """
+    Fetch one thumbnail variant for a page of items in a single query.
+
+    Args:
+        item_ids: IDs of the items on the page
+        variant: One of THUMBNAIL_SIZES
+
+    Returns:
+        dict: item_id -> encoded thumbnail bytes (items without one are omitted)
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return {}
+
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    con = get_connection()
+    cur = con.cursor()
+    cur.execute(
+        f"SELECT item_id, data FROM item_thumbnails WHERE variant = %s AND item_id IN ({placeholders})",
+        [variant] + item_ids
+    )
+    thumbnails = dict(cur.fetchall())
+    cur.close()
+    con.close()
+    return thumbnails
+
+def get_thumbnail(item_id, variant):
+    """Fetch a single thumbnail variant for one item, or None if it does not exist."""
+    return get_thumbnails([item_id], variant).get(item_id)
+
+def backfill_thumbnails(batch_size=50):
+    """
+    Generate thumbnails for items that have an image but no thumbnails yet.
+
+    Args:
+        batch_size: Items processed per transaction
+
+    Returns:
+        int: Number of items processed
+    """
+    con = get_connection()
+    cur = con.cursor()
+    processed = 0
+    last_item_id = 0
+    while True:
+        cur.execute("""
+            SELECT i.item_id FROM items i
+            WHERE i.item_id > %s
+              AND i.has_image
+              AND NOT EXISTS (SELECT 1 FROM item_thumbnails t WHERE t.item_id = i.item_id)
+            ORDER BY i.item_id
+            LIMIT %s
+        """, (last_item_id, batch_size))
+        item_ids = [row[0] for row in cur.fetchall()]
+        if not item_ids:
+            break
+
+        for item_id in item_ids:
+            cur.execute("SELECT image_data FROM items WHERE item_id = %s", (item_id,))
+            image_bytes = cur.fetchone()[0]
+            try:
+                store_thumbnails(cur, item_id, image_bytes)
+                processed += 1
+            except Exception as e:
+                # Unreadable images are skipped; the page falls back to the original
+                print(f"Could not generate thumbnails for item {item_id}: {e}")
+        last_item_id = item_ids[-1]
+        con.commit()
+        print(f"Generated thumbnails for {processed} items")
+
+    cur.close()
+    con.close()
+    return processed
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage item image thumbnails")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Generate thumbnails for items that do not have them yet")
+    args = parser.parse_args()
+    if args.backfill:
+        backfill_thumbnails()
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
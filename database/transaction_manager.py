@@ -1,14 +1,19 @@
 # secondhand_market/database/transaction_manager.py
 
 import mysql.connector
+import functools
+import os
+import random
+import threading
+import time
 from contextlib import contextmanager
 from database.db_setup import get_connection
-from sqlalchemy.orm import Session
-from sqlalchemy import event
+from database.cache import ITEMS, invalidate
+from database.logging_config import configure_logging
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (queued, see logging_config.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Define isolation levels
@@ -44,7 +49,7 @@ def transaction(isolation_level=IsolationLevel.REPEATABLE_READ):
         
         # Start transaction
         connection.start_transaction()
-        logger.info(f"Transaction started with isolation level: {isolation_level}")
+        logger.info("Transaction started with isolation level: %s", isolation_level)
         
         yield connection, cursor
         
@@ -55,14 +60,112 @@ def transaction(isolation_level=IsolationLevel.REPEATABLE_READ):
     except Exception as e:
         # On error, roll back the transaction
         connection.rollback()
-        logger.error(f"Transaction rolled back due to error: {str(e)}")
+        logger.error("Transaction rolled back due to error: %s", e)
         raise
     
     finally:
-        # Always close cursor and connection
+        # Always close cursor and return the connection to the pool
         cursor.close()
         connection.close()
 
+# MySQL errors after which the whole transaction can safely be re-run.
+# Both roll back the statement (1213 rolls back the whole transaction); the
+# transaction() context manager rolls back the rest before we retry.
+RETRYABLE_ERRORS = {
+    1213: "deadlock",             # ER_LOCK_DEADLOCK
+    1205: "lock_wait_timeout",    # ER_LOCK_WAIT_TIMEOUT
+}
+
+# Retry policy: bounded exponential backoff with full jitter
+RETRY_MAX_ATTEMPTS = int(os.environ.get('DB_RETRY_MAX_ATTEMPTS', 4))
+RETRY_BASE_DELAY = float(os.environ.get('DB_RETRY_BASE_DELAY', 0.05))
+RETRY_MAX_DELAY = float(os.environ.get('DB_RETRY_MAX_DELAY', 1.0))
+
+# Lifetime retry counters for monitoring
+_retry_lock = threading.Lock()
+_retry_counters = {
+    "calls": 0,
+    "recovered": 0,       # calls that succeeded after at least one retry
+    "exhausted": 0,       # calls that failed after RETRY_MAX_ATTEMPTS attempts
+    **{f"retries_{name}": 0 for name in RETRYABLE_ERRORS.values()},
+}
+
+def _count_retry(name, amount=1):
+    with _retry_lock:
+        _retry_counters[name] += amount
+
+def classify_error(error):
+    """
+    Return the retry class of a database error ("deadlock", "lock_wait_timeout"),
+    or None if re-running the transaction would not help.
+    """
+    if isinstance(error, mysql.connector.Error):
+        return RETRYABLE_ERRORS.get(error.errno)
+    return None
+
+def retry_delay(attempt, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Return the backoff before retry number attempt (1-based): full jitter over a capped exponential."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+def retry_on_conflict(max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """
+    Decorator that re-runs a transactional function after a deadlock or lock wait timeout.
+
+    The decorated function must open its own transaction (e.g. with
+    transaction()) so each attempt starts from a clean rollback, and must not
+    swallow database errors. Other errors are raised immediately; retryable
+    ones are raised once max_attempts is reached.
+
+    Args:
+        max_attempts: Total attempts, including the first
+        base_delay: Backoff before the first retry, doubled for every further retry
+        max_delay: Upper bound for a single backoff
+
+    Example:
+        @retry_on_conflict()
+        def mark_sold(item_id):
+            with transaction(IsolationLevel.SERIALIZABLE) as (conn, cursor):
+                cursor.execute("UPDATE items SET status = 'Sold' WHERE item_id = %s", (item_id,))
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _count_retry("calls")
+            attempt = 1
+            while True:
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    error_class = classify_error(e)
+                    if error_class is None:
+                        raise
+                    if attempt >= max_attempts:
+                        _count_retry("exhausted")
+                        logger.error("%s failed after %d attempts: %s", func.__name__, attempt, error_class)
+                        raise
+                    _count_retry(f"retries_{error_class}")
+                    delay = retry_delay(attempt, base_delay, max_delay)
+                    logger.warning("%s hit %s (attempt %d/%d), retrying in %.3fs",
+                                   func.__name__, error_class, attempt, max_attempts, delay)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if attempt > 1:
+                    _count_retry("recovered")
+                return result
+        return wrapper
+    return decorator
+
+def get_retry_stats():
+    """
+    Return a snapshot of the transaction retry counters for monitoring.
+
+    Returns:
+        dict: calls, recovered, exhausted and retries_<error class> counts
+    """
+    with _retry_lock:
+        return dict(_retry_counters)
+
 @contextmanager
 def sqlalchemy_transaction(session, isolation_level=IsolationLevel.REPEATABLE_READ):
     """
@@ -87,7 +190,7 @@ def sqlalchemy_transaction(session, isolation_level=IsolationLevel.REPEATABLE_RE
     
     try:
         # The transaction is already started by SQLAlchemy
-        logger.info(f"SQLAlchemy transaction started with isolation level: {isolation_level}")
+        logger.info("SQLAlchemy transaction started with isolation level: %s", isolation_level)
         
         yield session
         
@@ -98,28 +201,54 @@ def sqlalchemy_transaction(session, isolation_level=IsolationLevel.REPEATABLE_RE
     except Exception as e:
         # Rollback on error
         session.rollback()
-        logger.error(f"SQLAlchemy transaction rolled back due to error: {str(e)}")
+        logger.error("SQLAlchemy transaction rolled back due to error: %s", e)
         raise
     
     finally:
         # Close the session
         session.close()
 
+class ConcurrencyMode:
+    """How item updates guard against concurrent writers"""
+    # Lock the row with SELECT ... FOR UPDATE, check, then update
+    PESSIMISTIC = "pessimistic"
+    # One conditional UPDATE that only matches the expected state and version
+    OPTIMISTIC = "optimistic"
+
 # Demonstration function for concurrent item status update
-def update_item_status_safely(item_id, new_status, isolation_level=IsolationLevel.SERIALIZABLE):
+@retry_on_conflict()
+def update_item_status_safely(item_id, new_status, isolation_level=IsolationLevel.SERIALIZABLE,
+                              mode=ConcurrencyMode.PESSIMISTIC, expected_version=None):
     """
     Updates an item's status with proper transaction handling to prevent conflicts.
     
-    This function uses SERIALIZABLE isolation to prevent lost updates in concurrent scenarios.
+    In PESSIMISTIC mode (default) the row is locked with SELECT ... FOR UPDATE
+    under SERIALIZABLE isolation to prevent lost updates. In OPTIMISTIC mode a
+    single conditional UPDATE checks the row version instead, so no lock is
+    held across round trips; the update fails if anyone changed the item since
+    expected_version (or since the version read at the start of the call).
     
     Args:
         item_id: ID of the item to update
         new_status: New status value ('Available', 'Pending', 'Sold')
-        isolation_level: Transaction isolation level
+        isolation_level: Transaction isolation level (PESSIMISTIC mode only)
+        mode: ConcurrencyMode.PESSIMISTIC or ConcurrencyMode.OPTIMISTIC
+        expected_version: Version the caller last saw (OPTIMISTIC mode only)
     
     Returns:
         bool: True if update was successful, False if item was already updated by another user
     """
+    if mode == ConcurrencyMode.OPTIMISTIC:
+        updated = _update_item_status_optimistic(item_id, new_status, expected_version)
+    else:
+        updated = _update_item_status_pessimistic(item_id, new_status, isolation_level)
+    
+    # Cached listings are stale once the change is committed
+    if updated:
+        invalidate(ITEMS)
+    return updated
+
+def _update_item_status_pessimistic(item_id, new_status, isolation_level):
     with transaction(isolation_level) as (conn, cursor):
         # First check current status
         cursor.execute("SELECT status FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
@@ -132,7 +261,7 @@ def update_item_status_safely(item_id, new_status, isolation_level=IsolationLeve
         
         # Implement business logic for allowed status transitions
         if current_status == 'Sold' and new_status != 'Sold':
-            logger.warning(f"Cannot change status of sold item {item_id}")
+            logger.warning("Cannot change status of sold item %s", item_id)
             return False
         
         # If status is "Pending", only the same user who set it to pending should be able to update
@@ -140,28 +269,72 @@ def update_item_status_safely(item_id, new_status, isolation_level=IsolationLeve
         
         # Update the status
         cursor.execute(
-            "UPDATE items SET status = %s WHERE item_id = %s",
+            "UPDATE items SET status = %s, version = version + 1 WHERE item_id = %s",
             (new_status, item_id)
         )
         
         # Check if row was actually updated
         return cursor.rowcount > 0
 
+def _update_item_status_optimistic(item_id, new_status, expected_version):
+    with transaction(IsolationLevel.READ_COMMITTED) as (conn, cursor):
+        if expected_version is None:
+            cursor.execute("SELECT version FROM items WHERE item_id = %s", (item_id,))
+            result = cursor.fetchone()
+            if not result:
+                return False  # Item doesn't exist
+            expected_version = result['version']
+        
+        # The status transition rule is part of the condition: sold items stay sold
+        cursor.execute(
+            """
+            UPDATE items SET status = %s, version = version + 1
+            WHERE item_id = %s AND version = %s AND (status <> 'Sold' OR %s = 'Sold')
+            """,
+            (new_status, item_id, expected_version, new_status)
+        )
+        updated = cursor.rowcount > 0
+    
+    if not updated:
+        logger.warning("Optimistic status update of item %s lost to a concurrent change", item_id)
+    return updated
+
 # Demonstration function for concurrent item purchase
-def purchase_item(item_id, buyer_id, isolation_level=IsolationLevel.SERIALIZABLE):
+@retry_on_conflict()
+def purchase_item(item_id, buyer_id, isolation_level=IsolationLevel.SERIALIZABLE,
+                  mode=ConcurrencyMode.PESSIMISTIC, expected_version=None):
     """
     Purchases an item with proper transaction handling to prevent conflicts.
     
-    Uses SERIALIZABLE isolation to ensure the item isn't purchased by multiple buyers.
+    In PESSIMISTIC mode (default) SERIALIZABLE isolation and a row lock ensure
+    the item isn't purchased by multiple buyers. In OPTIMISTIC mode a single
+    UPDATE ... WHERE status = 'Available' [AND version = expected_version]
+    does the check and the write atomically; only one concurrent buyer can
+    match it.
     
     Args:
         item_id: ID of the item to purchase
         buyer_id: ID of the buyer
-        isolation_level: Transaction isolation level
+        isolation_level: Transaction isolation level (PESSIMISTIC mode only)
+        mode: ConcurrencyMode.PESSIMISTIC or ConcurrencyMode.OPTIMISTIC
+        expected_version: Version the buyer last saw, or None to accept any
+            version of an available item (OPTIMISTIC mode only)
     
     Returns:
         bool: True if purchase was successful, False if item was already sold/pending
     """
+    if mode == ConcurrencyMode.OPTIMISTIC:
+        purchased = _purchase_item_optimistic(item_id, expected_version)
+    else:
+        purchased = _purchase_item_pessimistic(item_id, isolation_level)
+    
+    if not purchased:
+        return False
+    invalidate(ITEMS)
+    logger.info("Item %s purchased successfully by user %s", item_id, buyer_id)
+    return True
+
+def _purchase_item_pessimistic(item_id, isolation_level):
     with transaction(isolation_level) as (conn, cursor):
         # Check if item is available, using FOR UPDATE to lock the row
         cursor.execute(
@@ -171,16 +344,16 @@ def purchase_item(item_id, buyer_id, isolation_level=IsolationLevel.SERIALIZABLE
         item = cursor.fetchone()
         
         if not item:
-            logger.warning(f"Item {item_id} not found")
+            logger.warning("Item %s not found", item_id)
             return False
             
         if item['status'] != 'Available':
-            logger.warning(f"Item {item_id} is not available for purchase (status: {item['status']})")
+            logger.warning("Item %s is not available for purchase (status: %s)", item_id, item['status'])
             return False
             
         # Update item status to Sold
         cursor.execute(
-            "UPDATE items SET status = 'Sold' WHERE item_id = %s",
+            "UPDATE items SET status = 'Sold', version = version + 1 WHERE item_id = %s",
             (item_id,)
         )
         
@@ -191,5 +364,19 @@ def purchase_item(item_id, buyer_id, isolation_level=IsolationLevel.SERIALIZABLE
         #     (item_id, buyer_id, item['seller_id'], item['price'])
         # )
         
-        logger.info(f"Item {item_id} purchased successfully by user {buyer_id}")
-        return True 
\ No newline at end of file
+        return True
+
+def _purchase_item_optimistic(item_id, expected_version):
+    query = "UPDATE items SET status = 'Sold', version = version + 1 WHERE item_id = %s AND status = 'Available'"
+    params = [item_id]
+    if expected_version is not None:
+        query += " AND version = %s"
+        params.append(expected_version)
+    
+    with transaction(IsolationLevel.READ_COMMITTED) as (conn, cursor):
+        cursor.execute(query, params)
+        purchased = cursor.rowcount > 0
+    
+    if not purchased:
+        logger.warning("Item %s is no longer available for purchase (or changed since it was viewed)", item_id)
+    return purchased
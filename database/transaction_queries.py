@@ -0,0 +1,110 @@
+# secondhand_market/database/transaction_queries.py
+"""
+Shared transaction history queries.
+
+Date filters are half-open datetime ranges on the raw transaction_date
+column (>= start, < end_before) rather than DATE(transaction_date)
+comparisons, so the date and seller/buyer + date indexes stay usable.
+
+History is read one keyset page at a time (newest first), with the totals
+computed by MySQL, so a request never holds more than one page of rows.
+"""
+
+import datetime
+from database.transaction_manager import transaction, IsolationLevel
+
+# Transactions shown per history page
+HISTORY_PAGE_SIZE = 25
+
+HISTORY_FROM = """
+    FROM transactions t
+    JOIN items i ON t.item_id = i.item_id
+    JOIN users s ON t.seller_id = s.user_id
+    JOIN users b ON t.buyer_id = b.user_id
+"""
+
+def day_range(start_date=None, end_date=None):
+    """
+    Turn an inclusive range of calendar days into a half-open datetime range.
+
+    Args:
+        start_date: First day to include (date), or None
+        end_date: Last day to include (date), or None
+
+    Returns:
+        tuple: (start, end_before) datetimes; either may be None
+    """
+    start = datetime.datetime.combine(start_date, datetime.time.min) if start_date else None
+    end_before = (datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+                  if end_date else None)
+    return start, end_before
+
+def build_transaction_filter(start=None, end_before=None, seller_id=None, buyer_id=None):
+    """
+    Build a sargable WHERE clause over transactions containing only the filters in use.
+
+    Args:
+        start: Earliest transaction_date (inclusive), or None
+        end_before: transaction_date upper bound (exclusive), or None
+        seller_id: Seller to match, or None
+        buyer_id: Buyer to match, or None
+
+    Returns:
+        tuple: (where_sql, params)
+    """
+    clauses = []
+    params = []
+
+    if seller_id is not None:
+        clauses.append("t.seller_id = %s")
+        params.append(seller_id)
+    if buyer_id is not None:
+        clauses.append("t.buyer_id = %s")
+        params.append(buyer_id)
+    if start is not None:
+        clauses.append("t.transaction_date >= %s")
+        params.append(start)
+    if end_before is not None:
+        clauses.append("t.transaction_date < %s")
+        params.append(end_before)
+
+    where_sql = "WHERE " + " AND ".join(clauses) if clauses else "WHERE 1=1"
+    return where_sql, params
+
+def get_transaction_history_page(start=None, end_before=None, seller_id=None, buyer_id=None,
+                                 after=None, page_size=HISTORY_PAGE_SIZE):
+    """
+    Fetch one page of transaction history plus totals over every match.
+
+    Args:
+        start: Earliest transaction_date (inclusive), or None
+        end_before: transaction_date upper bound (exclusive), or None
+        seller_id: Seller to match, or None
+        buyer_id: Buyer to match, or None
+        after: (transaction_date, transaction_id) of the last row of the
+            previous page (the date may be None), or None for the first page
+        page_size: Rows per page
+
+    Returns:
+        tuple: (rows, totals, next_after); totals is a dict with
+        total_transactions, total_value and avg_price, and next_after is the
+        boundary for the following page or None on the last page
+    """
+    keyset_date, keyset_id = after if after else (None, None)
+    with transaction(IsolationLevel.READ_COMMITTED) as (conn, cursor):
+        cursor.execute(
+            "CALL get_transaction_history(%s, %s, %s, %s, %s, %s, %s)",
+            [start, end_before, seller_id, buyer_id, keyset_date, keyset_id, page_size + 1]
+        )
+        rows = cursor.fetchall()
+        totals = {}
+        while cursor.nextset():
+            if cursor.description is not None:
+                totals = cursor.fetchone() or {}
+                cursor.fetchall()
+
+    next_after = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_after = (rows[-1]["transaction_date"], rows[-1]["transaction_id"])
+    return rows, totals, next_after
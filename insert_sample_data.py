@@ -1,16 +1,36 @@
 # insert_sample_data.py
-import mysql.connector
-from database.db_setup import get_connection, init_db, check_and_update_schema
-import random
-from datetime import datetime, timedelta
+"""
+Seed the database with sample items.
+
+Usage:
+    python insert_sample_data.py
+    python insert_sample_data.py --copies 200 --images-dir fixtures/images --force
+
+Images are fetched concurrently (from their URLs, or from a local fixture
+directory for offline use), resized and thumbnailed in a process pool,
+and the items are written with multi-row INSERTs in chunked transactions.
+Each unique image is fetched and processed once, however many copies of
+the sample catalog are inserted. Lower --batch-size if a batch exceeds
+the server's max_allowed_packet.
+"""
+import argparse
 import os
 import io
-from PIL import Image
-import requests
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from database.db_setup import get_connection, init_db
+from database.thumbnails import generate_thumbnails, image_hash
+from database.cache import ITEMS, invalidate
+from database.categories import get_category_catalog
+from database.rollups import refresh_rollups
 
-# Make sure the database is initialized first
-init_db()
-check_and_update_schema()
+# Rows per multi-row INSERT and per transaction
+DEFAULT_BATCH_SIZE = 200
+
+# File extensions tried when looking up a fixture image
+FIXTURE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
 
 # Sample data for different categories
 sample_data = {
@@ -225,6 +245,7 @@ sample_data = {
 
 def download_image(url):
     """Download an image from a URL and return as bytes"""
+    import requests  # Only needed when images are fetched over the network
     try:
         response = requests.get(url, stream=True, timeout=10)
         if response.status_code == 200:
@@ -236,11 +257,41 @@ def download_image(url):
         print(f"Error downloading image {url}: {e}")
         return None
 
+class UrlImageSource:
+    """Fetches sample images from their URLs."""
+
+    def fetch(self, url):
+        return download_image(url)
+
+class DirectoryImageSource:
+    """
+    Reads sample images from a local fixture directory, for offline use.
+
+    The file for https://host/path/photo-123?w=500 is photo-123 with one of
+    FIXTURE_EXTENSIONS; missing files mean no image.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, url):
+        name = url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+        for extension in ("",) + FIXTURE_EXTENSIONS:
+            path = os.path.join(self.directory, name + extension)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        print(f"No fixture image for {url} in {self.directory}")
+        return None
+
 def resize_image(image_bytes, max_size=(800, 800)):
     """Resize an image to a reasonable size for storage"""
+    from PIL import Image
     try:
         img = Image.open(io.BytesIO(image_bytes))
         img.thumbnail(max_size)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
         output = io.BytesIO()
         img.save(output, format='JPEG')
         return output.getvalue()
@@ -248,6 +299,19 @@ def resize_image(image_bytes, max_size=(800, 800)):
         print(f"Error resizing image: {e}")
         return None
 
+def prepare_image(image_bytes):
+    """
+    Resize an image and render its thumbnails (runs in a worker process).
+
+    Returns:
+        tuple: (image_data, source_hash, thumbnails) or None if the image is unusable;
+        thumbnails maps variant -> (data, format, width, height)
+    """
+    image_data = resize_image(image_bytes)
+    if not image_data:
+        return None
+    return image_data, image_hash(image_data), generate_thumbnails(image_data)
+
 def generate_random_date(start_date, end_date):
     """Generate a random date between start_date and end_date"""
     time_between_dates = end_date - start_date
@@ -256,8 +320,145 @@ def generate_random_date(start_date, end_date):
     random_date = start_date + timedelta(days=random_number_of_days)
     return random_date
 
-def insert_sample_data():
-    """Insert sample data into the database"""
+def report_progress(stage, done, total, started, unit, extra=""):
+    """Print one progress line with throughput."""
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"[{stage}] {done}/{total} {unit} in {elapsed:.1f}s ({rate:.1f} {unit}/s){extra}")
+
+def fetch_images(urls, source, workers):
+    """
+    Fetch every URL once with a thread pool.
+
+    Returns:
+        dict: url -> image bytes (None when unavailable)
+    """
+    images = {}
+    started = time.perf_counter()
+    total_bytes = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, (url, data) in enumerate(zip(urls, executor.map(source.fetch, urls)), start=1):
+            images[url] = data
+            total_bytes += len(data) if data else 0
+            if done % 10 == 0 or done == len(urls):
+                report_progress("fetch", done, len(urls), started, "images",
+                                f", {total_bytes / 1_000_000:.1f} MB")
+    return images
+
+def prepare_images(images, workers):
+    """
+    Resize and thumbnail every fetched image with a process pool.
+
+    Returns:
+        dict: url -> prepare_image() result (None when unusable)
+    """
+    urls = [url for url, data in images.items() if data]
+    prepared = {url: None for url in images}
+    if not urls:
+        return prepared
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(prepare_image, [images[url] for url in urls])
+        for done, (url, result) in enumerate(zip(urls, results), start=1):
+            prepared[url] = result
+            if done % 10 == 0 or done == len(urls):
+                report_progress("resize", done, len(urls), started, "images")
+    return prepared
+
+def build_item_rows(copies, seller_id, catalog):
+    """
+    Expand the sample catalog into item rows.
+
+    Returns:
+        list: (values for the items INSERT without image_data, image url or None)
+    """
+    # Define date range for item creation (past 3 months to today)
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=90)
+
+    rows = []
+    for copy in range(copies):
+        for category, items in sample_data.items():
+            for item in items:
+                title = item['title'] if copies == 1 else f"{item['title']} (#{copy + 1})"
+                # Randomly select status with higher probability for Available
+                status = random.choices(["Available", "Pending", "Sold"], weights=[0.7, 0.15, 0.15])[0]
+                values = (
+                    title,
+                    item['description'],
+                    item['price'],
+                    item['condition'],
+                    generate_random_date(start_date, end_date),
+                    status,
+                    seller_id,
+                    catalog.id_for(category),
+                    item['contact_preference'],
+                    item['location'],
+                )
+                rows.append((values, item.get('image_url')))
+    return rows
+
+def insert_batch(cursor, batch, prepared):
+    """
+    Insert one batch of items and their thumbnails with multi-row INSERTs.
+
+    Raises:
+        RuntimeError: If the batch did not get consecutive item IDs (another
+            session inserted items at the same time)
+    """
+    item_values = []
+    for values, url in batch:
+        image = prepared.get(url) if url else None
+        item_values.append(values + (image[0] if image else None,))
+
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(item_values))
+    cursor.execute(f"""
+        INSERT INTO items
+        (title, description, price, condition_status, created_at, status,
+         seller_id, category_id, contact_preference, location, image_data)
+        VALUES {placeholders}
+    """, [value for values in item_values for value in values])
+
+    # A multi-row INSERT reports the ID of its first row; make sure nobody
+    # else's rows were interleaved before mapping thumbnails onto the range
+    first_id = cursor.lastrowid
+    last_id = first_id + len(batch) - 1
+    cursor.execute("SELECT COUNT(*) FROM items WHERE item_id BETWEEN %s AND %s", (first_id, last_id))
+    if cursor.fetchone()[0] != len(batch):
+        raise RuntimeError("Items were inserted concurrently; run the loader on an idle database")
+
+    thumbnail_rows = []
+    for item_id, (values, url) in zip(range(first_id, last_id + 1), batch):
+        image = prepared.get(url) if url else None
+        if image:
+            _, source_hash, thumbnails = image
+            thumbnail_rows.extend(
+                (item_id, variant, image_format, width, height, source_hash, data)
+                for variant, (data, image_format, width, height) in thumbnails.items()
+            )
+    if thumbnail_rows:
+        cursor.executemany("""
+            INSERT INTO item_thumbnails (item_id, variant, format, width, height, source_hash, data)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, thumbnail_rows)
+
+def insert_sample_data(copies=1, images_dir=None, fetch_images_enabled=True, fetch_workers=8,
+                       resize_workers=None, batch_size=DEFAULT_BATCH_SIZE, force=False):
+    """
+    Insert sample data into the database
+
+    Args:
+        copies: How many times to insert the sample catalog
+        images_dir: Local fixture directory to read images from instead of downloading them
+        fetch_images_enabled: Set to False to insert items without images
+        fetch_workers: Threads fetching images
+        resize_workers: Processes resizing images (default: one per CPU)
+        batch_size: Items per multi-row INSERT and per transaction
+        force: Insert even if the database already has items
+    """
+    # Make sure the database is initialized first
+    init_db()
+
     # Connect to the database
     conn = get_connection()
     cursor = conn.cursor()
@@ -266,78 +467,75 @@ def insert_sample_data():
     cursor.execute("SELECT COUNT(*) FROM items")
     item_count = cursor.fetchone()[0]
     
-    if item_count > 10:
-        print(f"Database already has {item_count} items. Skipping sample data insertion.")
+    if item_count > 10 and not force:
+        print(f"Database already has {item_count} items. Skipping sample data insertion (use --force to add more).")
+        cursor.close()
         conn.close()
         return
     
     # Get the default user_id (should be 1)
     cursor.execute("SELECT user_id FROM users LIMIT 1")
     seller_id = cursor.fetchone()[0]
+    conn.commit()
     
-    print(f"Inserting sample data using seller_id: {seller_id}")
+    print(f"Inserting {copies} cop{'y' if copies == 1 else 'ies'} of the sample data using seller_id: {seller_id}")
+    rows = build_item_rows(copies, seller_id, get_category_catalog())
     
-    # Define date range for item creation (past 3 months to today)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=90)
+    # Fetch and process each distinct image once
+    prepared = {}
+    urls = sorted({url for _, url in rows if url})
+    if fetch_images_enabled and urls:
+        source = DirectoryImageSource(images_dir) if images_dir else UrlImageSource()
+        prepared = prepare_images(fetch_images(urls, source, fetch_workers), resize_workers)
     
-    # Track number of inserted items
+    # Insert in chunks, one transaction per chunk
+    started = time.perf_counter()
     inserted_count = 0
-    
-    # Insert items from each category
-    for category, items in sample_data.items():
-        print(f"Adding items for category: {category}")
-        
-        for item in items:
-            # Download and resize the image
-            if 'image_url' in item:
-                image_bytes = download_image(item['image_url'])
-                if image_bytes:
-                    image_data = resize_image(image_bytes)
-                else:
-                    image_data = None
-            else:
-                image_data = None
-            
-            # Generate random creation date
-            created_at = generate_random_date(start_date, end_date)
-            
-            # Randomly select status with higher probability for Available
-            status = random.choices(
-                ["Available", "Pending", "Sold"],
-                weights=[0.7, 0.15, 0.15]
-            )[0]
-            
-            # Insert item into database
-            insert_query = """
-                INSERT INTO items 
-                (title, description, price, condition_status, created_at, status, 
-                 seller_id, category, contact_preference, location, image_data)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor.execute(insert_query, (
-                item['title'],
-                item['description'],
-                item['price'],
-                item['condition'],
-                created_at,
-                status,
-                seller_id,
-                category,
-                item['contact_preference'],
-                item['location'],
-                image_data
-            ))
-            
-            inserted_count += 1
-    
-    # Commit the changes
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            conn.start_transaction()
+            insert_batch(cursor, batch, prepared)
+            conn.commit()
+            inserted_count += len(batch)
+            report_progress("insert", inserted_count, len(rows), started, "items")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+        # Drop cached listings (only matters with a shared Redis cache backend)
+        if inserted_count:
+            invalidate(ITEMS)
     
     print(f"Successfully inserted {inserted_count} sample items into the database.")
 
+    # Roll up the new items here rather than on the next Reports render
+    if inserted_count:
+        print(f"Refreshed report rollups for {refresh_rollups()} day(s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Insert sample items into the SecondHand Market database")
+    parser.add_argument("--copies", type=int, default=1, help="Times to insert the sample catalog")
+    parser.add_argument("--images-dir", help="Read images from this fixture directory instead of downloading them")
+    parser.add_argument("--no-images", action="store_true", help="Insert items without images")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Threads fetching images")
+    parser.add_argument("--resize-workers", type=int, help="Processes resizing images (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Items per multi-row INSERT and per transaction")
+    parser.add_argument("--force", action="store_true", help="Insert even if the database already has items")
+    args = parser.parse_args()
+
+    insert_sample_data(
+        copies=args.copies,
+        images_dir=args.images_dir,
+        fetch_images_enabled=not args.no_images,
+        fetch_workers=args.fetch_workers,
+        resize_workers=args.resize_workers,
+        batch_size=args.batch_size,
+        force=args.force,
+    )
+
 if __name__ == "__main__":
-    insert_sample_data() 
\ No newline at end of file
+    main()
@@ -1,14 +1,11 @@
 # secondhand_market/main.py
 
 import streamlit as st
-from database.db_setup import init_db, check_and_update_schema, get_connection
-import pandas as pd
+from database.db_setup import schema_is_current, get_connection
+from admin import admin_requested, admin_page
+from database.categories import get_category_catalog
 
 def home_page():
-    # Initialize and update DB
-    init_db()
-    check_and_update_schema()
-
     # Page configuration
     st.set_page_config(
         page_title="SecondHand Market - Home",
@@ -16,6 +13,15 @@ def home_page():
         layout="wide"
     )
 
+    # Hidden diagnostics view, see admin.py
+    if admin_requested():
+        admin_page()
+        return
+
+    # One cheap version check per process; migrations run at deploy time
+    if not schema_is_current():
+        st.error("The database schema is out of date. Run `python -m database.migrations` to upgrade it.")
+
     # Header with logo and title
     col1, col2 = st.columns([1, 3])
     with col1:
@@ -46,8 +52,7 @@ def home_page():
         available_items = cur.fetchone()['count']
         
         # Get categories count
-        cur.execute("SELECT COUNT(DISTINCT category) as count FROM items")
-        categories = cur.fetchone()['count']
+        categories = len(get_category_catalog())
         
         cur.close()
         conn.close()
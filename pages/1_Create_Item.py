@@ -2,30 +2,44 @@
 
 import streamlit as st
 import datetime
-from database.db_setup import get_connection
-from database.orm_models import get_session, User, Item, Category
-import base64
-from PIL import Image
+from database.db_setup import get_connection, schema_is_current
+from database.orm_models import User, Item, ItemThumbnail
+from database.thumbnails import generate_thumbnails, image_hash
+from database.cache import ITEMS, invalidate
+from database.categories import get_category_catalog
 import io
 from decimal import Decimal
-from database.transaction_manager import transaction, IsolationLevel, sqlalchemy_transaction
+from database.transaction_manager import transaction, IsolationLevel
+from database.sessions import current_session, page_session, unit_of_work
 
 def get_user_info(user_id):
     """Get the user information for the current user using ORM"""
-    session = get_session()
-    user = session.query(User).filter(User.user_id == user_id).first()
-    session.close()
-    return user
+    return current_session().query(User).filter(User.user_id == user_id).first()
 
-def update_user_contact(user_id, email, phone):
-    """Update the user's contact information if changed using ORM"""
-    session = get_session()
-    user = session.query(User).filter(User.user_id == user_id).first()
-    if user:
-        user.email = email
-        user.phone = phone
-        session.commit()
-    session.close()
+def _normalize_contact(value):
+    """Treat blank input and NULL alike"""
+    return (value or "").strip() or None
+
+def contact_changes(user, email, phone):
+    """Return {field: new value} for the contact fields that differ from the loaded user"""
+    submitted = {"email": email, "phone": phone}
+    return {
+        field: _normalize_contact(value)
+        for field, value in submitted.items()
+        if _normalize_contact(value) != _normalize_contact(getattr(user, field))
+    }
+
+def update_user_contact(user, email, phone):
+    """
+    Apply changed contact fields to a user loaded in the current unit of work.
+
+    Nothing is marked dirty when the values are unchanged, so the flush
+    issues no UPDATE. Returns True if anything changed.
+    """
+    changes = contact_changes(user, email, phone)
+    for field, value in changes.items():
+        setattr(user, field, value)
+    return bool(changes)
 
 def create_item_page():
     st.title("Create a New Item")
@@ -45,27 +59,19 @@ def create_item_page():
         st.subheader("Your Contact Information")
         seller_email = st.text_input("Email Address", value=user_data.email if user_data and user_data.email else '')
         seller_phone = st.text_input("Phone Number", value=user_data.phone if user_data and user_data.phone else '')
+        if user_data and contact_changes(user_data, seller_email, seller_phone):
+            st.caption("Contact changes are saved when you create the item.")
         
-        # Update user contact info if provided
-        if seller_email or seller_phone:
-            update_user_contact(seller_id, seller_email, seller_phone)
-            
         st.subheader("Item Details")
         
         with st.form("create_item_form"):
             # Basic item information
             title = st.text_input("Title*", help="Give your item a clear, descriptive title")
             
-            # Category selection - get options from database
-            session = get_session()
-            categories = session.query(Category).order_by(Category.name).all()
-            category_options = [cat.name for cat in categories]
-            category = st.selectbox("Category", category_options)
-            
-            # Get the category_id for the selected category
-            selected_category = session.query(Category).filter(Category.name == category).first()
-            category_id = selected_category.category_id if selected_category else None
-            session.close()
+            # Category selection from the in-process catalog
+            catalog = get_category_catalog()
+            category = st.selectbox("Category", catalog.names())
+            category_id = catalog.id_for(category)
             
             description = st.text_area("Description*", help="Describe your item, include details about features and condition")
             
@@ -116,17 +122,18 @@ def create_item_page():
                         if uploaded_file is not None:
                             image_data = uploaded_file.getvalue()
                         
-                        # Create new item using SQLAlchemy transaction with SERIALIZABLE isolation
-                        session = get_session()
-                        
-                        with sqlalchemy_transaction(session, IsolationLevel.SERIALIZABLE) as session:
-                            # Verify seller exists
-                            seller = session.query(User).filter(User.user_id == seller_id).first()
+                        # Create new item in one SERIALIZABLE unit of work on the page's session
+                        with unit_of_work(IsolationLevel.SERIALIZABLE) as session:
+                            # Verify seller exists (reloading the row this transaction sees)
+                            seller = session.query(User).populate_existing().filter(User.user_id == seller_id).first()
                             
                             if not seller:
                                 st.error(f"Seller ID {seller_id} does not exist")
                                 return
                             
+                            # Contact edits are written here, with the item, and only if they changed
+                            update_user_contact(seller, seller_email, seller_phone)
+                            
                             # Create new item
                             new_item = Item(
                                 title=title,
@@ -140,9 +147,26 @@ def create_item_page():
                                 image_data=image_data
                             )
                             
+                            # Pre-render thumbnails so browsing never decodes the original
+                            if image_data:
+                                source_hash = image_hash(image_data)
+                                new_item.thumbnails = [
+                                    ItemThumbnail(
+                                        variant=variant,
+                                        format=image_format,
+                                        width=width,
+                                        height=height,
+                                        source_hash=source_hash,
+                                        data=data
+                                    )
+                                    for variant, (data, image_format, width, height)
+                                    in generate_thumbnails(image_data).items()
+                                ]
+                            
                             session.add(new_item)
                             # Transaction will be committed at the end of the context manager
                         
+                        invalidate(ITEMS)
                         st.success(f"Item '{title}' successfully created!")
                         st.balloons()
                         
@@ -179,6 +203,8 @@ def create_item_page():
         # Display image preview if uploaded
         if 'uploaded_file' in locals() and uploaded_file is not None:
             try:
+                # Pillow is only needed for the preview, so load it here
+                from PIL import Image
                 image = Image.open(io.BytesIO(uploaded_file))
                 st.image(image, caption="Item image", use_container_width=True)
             except Exception:
@@ -206,7 +232,12 @@ def create_item_page():
         st.switch_page("pages/2_View_Items.py")
 
 def app():
-    create_item_page()
+    if not schema_is_current():
+        st.error("The database schema is out of date. Run `python -m database.migrations` to upgrade it.")
+        st.stop()
+    # One ORM session (and connection) for the whole render
+    with page_session():
+        create_item_page()
 
 if __name__ == "__main__":
     app()
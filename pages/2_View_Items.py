@@ -1,21 +1,23 @@
 # secondhand_market/pages/2_View_Items.py
 
 import streamlit as st
-from database.db_setup import get_connection
-import io
-from PIL import Image
-import base64
+from database.db_setup import get_connection, schema_is_current
 import datetime
-from database.create_procedures import create_procedures
-from database.transaction_manager import transaction, IsolationLevel, update_item_status_safely
-from database.orm_models import get_session, Category, Transaction, Item, User
+from database.transaction_manager import transaction, IsolationLevel, update_item_status_safely, retry_on_conflict
+from database.item_queries import LISTING_COLUMNS, LISTING_FROM, build_item_filter, get_item_listing, get_item_image
+from database.thumbnails import get_thumbnails, get_thumbnail, store_thumbnails
+from database.search import search_predicate
+from database.counting import count_items, format_count
+from database.cache import ITEMS, cached_query, invalidate
+from database.categories import get_category_catalog
+from database.pagination import (
+    SORT_ORDERS, filter_fingerprint, decode_page_token, seek_direction,
+    keyset_clause, finish_page, finish_offset_page
+)
 
 def view_items_page():
     st.title("Browse Items")
     
-    # Ensure stored procedures exist
-    create_procedures()
-    
     # Check if we have a specific item_id in query params
     query_params = st.query_params
     specific_item_id = query_params.get("item_id", [None])[0]
@@ -26,35 +28,31 @@ def view_items_page():
     # Sidebar filters section
     st.sidebar.header("Filters")
     
-    # Get all categories from the database - update to use categories table
-    con = get_connection()
-    cur = con.cursor()
-    cur.execute("SELECT category_id, name FROM categories ORDER BY name")
-    categories_data = cur.fetchall()
-    categories = [cat[1] for cat in categories_data]
-    category_id_map = {cat[1]: cat[0] for cat in categories_data}  # Map names to IDs
-    cur.close()
+    # Categories come from the in-process catalog, reloaded only when they change
+    catalog = get_category_catalog()
     
-    # Filter by category
-    selected_category = st.sidebar.selectbox(
+    # Filter by category; subcategories are listed indented under their parent
+    selected_category_id = st.sidebar.selectbox(
         "Category", 
-        ["All Categories"] + categories,
+        [None] + catalog.tree(),
+        format_func=lambda category_id: (
+            "All Categories" if category_id is None else catalog.label(category_id, indent="\u00a0" * 4)
+        ),
         index=0
     )
     
-    # Get category_id for the selected category
-    if selected_category != "All Categories":
-        selected_category_id = category_id_map.get(selected_category)
-    else:
-        selected_category_id = None
+    # A category also matches the items of all its subcategories
+    category_ids = catalog.descendants(selected_category_id) if selected_category_id else frozenset()
     
     # Filter by price range
     st.sidebar.subheader("Price Range")
+    con = get_connection()
     cur = con.cursor()
-    cur.execute("SELECT MIN(price), MAX(price) FROM items")
-    min_price, max_price = cur.fetchone()
+    min_price, max_price = cached_query(cur, "SELECT MIN(price), MAX(price) FROM items")[0]
     min_price = 0 if min_price is None else float(min_price)
     max_price = 1000 if max_price is None else float(max_price) + 100  # Add some buffer
+    cur.close()
+    con.close()
     
     price_range = st.sidebar.slider(
         "Select price range",
@@ -80,15 +78,12 @@ def view_items_page():
     sort_col1, sort_col2, sort_col3 = st.columns([2, 2, 1])
     
     with sort_col1:
-        sort_options = {
-            "Newest first": "i.created_at DESC",
-            "Oldest first": "i.created_at ASC",
-            "Price: Low to High": "i.price ASC",
-            "Price: High to Low": "i.price DESC",
-            "A-Z": "i.title ASC",
-            "Z-A": "i.title DESC"
-        }
-        selected_sort = st.selectbox("Sort by:", list(sort_options.keys()))
+        # Every sort order is paginated by (sort column, item_id) keyset
+        sort_options = list(SORT_ORDERS.keys())
+        # Rank by full-text relevance when searching
+        if search_query:
+            sort_options = ["Best match"] + sort_options
+        selected_sort = st.selectbox("Sort by:", sort_options)
     
     with sort_col2:
         # View options
@@ -101,133 +96,144 @@ def view_items_page():
     # Build the query based on filters
     params = []
     items = []
-    total_items = 0
+    total_label = "0"
+    current_page = 1
+    prev_token = None
+    next_token = None
+    items_per_page = 8 if view_type == "List" else 6
     
     # If there's a specific item ID, we use a direct query instead of stored procedure
     if specific_item_id:
-        query = "SELECT i.*, u.username, u.email FROM items i LEFT JOIN users u ON i.seller_id = u.user_id WHERE i.item_id = %s"
-        params = [specific_item_id]
-        
-        con = get_connection()
-        cur = con.cursor(dictionary=True)
-        cur.execute(query, params)
-        items = cur.fetchall()
-        total_items = len(items)
-        cur.close()
-        con.close()
+        item = get_item_listing(specific_item_id)
+        items = [item] if item else []
+        total_label = str(len(items))
     else:
         # Using stored procedure for basic filtering
-        if selected_category == "All Categories":
-            category_param = None
-        else:
-            category_param = selected_category_id
+        category_param = selected_category_id
             
         status_param = None if selected_status == "All" else selected_status
+        condition_param = None if selected_condition == "All Conditions" else selected_condition
+        
+        # A slider left at its full range is not a filter at all
+        min_price_param = price_range[0] if price_range[0] > min_price else None
+        max_price_param = price_range[1] if price_range[1] < max_price else None
         
         # Get filtered items using stored procedure
         con = get_connection()
         cur = con.cursor(dictionary=True)
         
-        # Date filter
-        date_filter_query = ""
-        date_params = []
+        # Date filter as a half-open range on created_at (no DATE() wrapper)
+        created_from = None
+        created_before = None
         
         if selected_date_filter != "Any time":
             today = datetime.datetime.now().date()
             if selected_date_filter == "Today":
-                date_filter_query = " AND DATE(i.created_at) = %s"
-                date_params = [today]
+                created_from = datetime.datetime.combine(today, datetime.time.min)
+                created_before = created_from + datetime.timedelta(days=1)
             elif selected_date_filter == "This week":
                 # Calculate start of week (Sunday or Monday depending on your preference)
                 start_of_week = today - datetime.timedelta(days=today.weekday())
-                date_filter_query = " AND i.created_at >= %s"
-                date_params = [start_of_week]
+                created_from = datetime.datetime.combine(start_of_week, datetime.time.min)
             elif selected_date_filter == "This month":
-                start_of_month = datetime.datetime(today.year, today.month, 1)
-                date_filter_query = " AND i.created_at >= %s"
-                date_params = [start_of_month]
+                created_from = datetime.datetime(today.year, today.month, 1)
         
         # Search query
         search_filter = ""
         search_params = []
         
+        search_order = None
+        search_order_params = []
+        
         if search_query:
-            search_filter = " AND (i.title LIKE %s OR i.description LIKE %s)"
-            search_param = f"%{search_query}%"
-            search_params = [search_param, search_param]
-        
-        # Call stored procedure for basic filtering
-        if not date_filter_query and not search_filter:
-            # We can use the stored procedure directly
-            cur.execute(
-                "CALL get_items_by_filter(%s, %s, %s, %s, %s)", 
-                [category_param, price_range[0], price_range[1], selected_condition, status_param]
+            # FULLTEXT match with prefix tokens instead of LIKE '%q%' scans
+            search_filter, search_params, search_order, search_order_params = search_predicate(search_query)
+        
+        # Page position from the opaque token in the URL; a token issued for a
+        # different sort order or filter set restarts at the first page
+        filter_key = filter_fingerprint(
+            category_param, price_range[0], price_range[1], selected_condition,
+            status_param, selected_date_filter, search_query, items_per_page
+        )
+        position = decode_page_token(st.query_params.get("page"), selected_sort, filter_key)
+        
+        # Filter predicates over items alone, emitting only the filters in use;
+        # the listing joins are added only for the page query, so counting
+        # never touches users or categories
+        where_sql, params = build_item_filter(
+            category_id=category_ids or None,
+            min_price=min_price_param,
+            max_price=max_price_param,
+            condition=condition_param,
+            status=status_param,
+            created_from=created_from,
+            created_before=created_before
+        )
+        
+        # Add search filter if needed
+        if search_filter:
+            where_sql += search_filter
+            params.extend(search_params)
+        
+        # Call stored procedure for basic filtering; it takes a single
+        # category, so a category with subcategories uses the ad-hoc query
+        if created_from is None and not search_filter and len(category_ids) <= 1:
+            # We can use the stored procedure directly; it returns one keyset page
+            sort_column, _ = SORT_ORDERS[selected_sort]
+            rows = cached_query(
+                cur,
+                "CALL get_items_by_filter(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", 
+                [category_param, min_price_param, max_price_param, condition_param, status_param,
+                 sort_column, seek_direction(selected_sort, position),
+                 str(position["value"]) if position and position["value"] is not None else None,
+                 position["item_id"] if position else None,
+                 items_per_page + 1]
             )
-            items = cur.fetchall()
             
-            # Count items (reopen cursor since stored procedure closes it)
-            total_items = len(items)
+            items, current_page, prev_token, next_token = finish_page(
+                rows, selected_sort, filter_key, position, items_per_page
+            )
         else:
             # Need to use standard query to combine with search and date filters
-            query = """
-                SELECT i.*, u.username, u.email 
-                FROM items i 
-                LEFT JOIN users u ON i.seller_id = u.user_id 
-                WHERE 1=1
-                    AND (i.category_id = %s OR %s IS NULL OR %s = 0)
-                    AND (i.price BETWEEN %s AND %s)
-                    AND (i.condition_status = %s OR %s IS NULL OR %s = 'All Conditions')
-                    AND (i.status = %s OR %s IS NULL OR %s = 'All')
-            """
-            params = [
-                category_param, category_param, category_param,
-                price_range[0], price_range[1],
-                selected_condition, selected_condition, selected_condition,
-                status_param, status_param, status_param
-            ]
-            
-            # Add date filter if needed
-            if date_filter_query:
-                query += date_filter_query
-                params.extend(date_params)
-                
-            # Add search filter if needed
-            if search_filter:
-                query += search_filter
-                params.extend(search_params)
-                
-            # Add sorting
-            query += f" ORDER BY {sort_options[selected_sort]}"
-            
-            # Get count first
-            count_query = query.replace("i.*, u.username, u.email", "COUNT(*)")
-            count_query = count_query.split("ORDER BY")[0]
-            
-            cur.execute(count_query, params)
-            total_items = cur.fetchone()['COUNT(*)']
-            
-            # Pagination
-            items_per_page = 8 if view_type == "List" else 6
-            total_pages = max(1, (total_items + items_per_page - 1) // items_per_page)
-            
-            with sort_col3:
-                # Add 1 to make it 1-indexed for users
-                current_page = st.number_input("Page", min_value=1, max_value=total_pages, value=1)
-            
-            # Adjust query for pagination
-            current_page = int(current_page)  # Ensure it's an integer
-            offset = (current_page - 1) * items_per_page
-            query += f" LIMIT {items_per_page} OFFSET {offset}"
+            from_where = f"{LISTING_FROM} {where_sql}"
             
-            # Execute query with pagination
-            cur.execute(query, params)
-            items = cur.fetchall()
+            # Listing projection without the image BLOB, one page plus a look-ahead row
+            if selected_sort == "Best match":
+                # Relevance first, newest first for ties or the LIKE fallback
+                order_by = "i.created_at DESC, i.item_id DESC"
+                if search_order:
+                    order_by = f"{search_order}, {order_by}"
+                offset = position.get("offset", 0) if position else 0
+                query = f"SELECT {LISTING_COLUMNS} {from_where} ORDER BY {order_by} LIMIT %s OFFSET %s"
+                rows = cached_query(cur, query, params + search_order_params + [items_per_page + 1, offset])
+                items, current_page, prev_token, next_token = finish_offset_page(
+                    rows, selected_sort, filter_key, position, items_per_page
+                )
+            else:
+                keyset_filter, keyset_params, order_by = keyset_clause(selected_sort, position)
+                query = f"SELECT {LISTING_COLUMNS} {from_where}{keyset_filter} ORDER BY {order_by} LIMIT %s"
+                rows = cached_query(cur, query, params + keyset_params + [items_per_page + 1])
+                items, current_page, prev_token, next_token = finish_page(
+                    rows, selected_sort, filter_key, position, items_per_page
+                )
+        
+        # Total matches: skipped when everything fits on the first page, otherwise
+        # cached per filter set and capped at "1,000+" for large result sets
+        if current_page == 1 and not next_token:
+            total_label = format_count(len(items), True)
+        else:
+            total_label = format_count(*count_items(cur, where_sql, params))
         
         cur.close()
         con.close()
     
+    with sort_col3:
+        if current_page > 1 and st.button("⏮ First page"):
+            del st.query_params["page"]
+            st.rerun()
+    
     # Display item count
-    st.markdown(f"**Showing {len(items)} of {total_items} items**")
+    st.markdown(f"**Showing {len(items)} of {total_label} items**")
     
     if not items:
         st.info("No items found matching your criteria.")
@@ -309,6 +315,9 @@ def view_items_page():
 
     # Display items based on view type
     if view_type == "Grid":
+        # Pre-encoded card thumbnails for the whole page in one query
+        card_thumbnails = get_thumbnails([row['item_id'] for row in items if row.get('has_image')], "card")
+        
         # Grid view (2 columns)
         cols = st.columns(2)
         
@@ -326,11 +335,11 @@ def view_items_page():
                     img_col, info_col = st.columns([1, 1])
                     
                     with img_col:
-                        # Display image if available
-                        if row.get('image_data'):
+                        # Display the pre-encoded thumbnail, falling back to the original
+                        if row.get('has_image'):
                             try:
-                                image = Image.open(io.BytesIO(row['image_data']))
-                                st.image(image, use_container_width=True)
+                                image_bytes = card_thumbnails.get(row['item_id']) or get_item_image(row['item_id'])
+                                st.image(image_bytes, use_container_width=True)
                             except Exception:
                                 st.markdown("📷 Image not available")
                         else:
@@ -378,26 +387,26 @@ def view_items_page():
                 display_item_details(row)
 
     # Pagination controls if not specific item
-    if not specific_item_id and 'total_pages' in locals() and total_pages > 1:
+    if not specific_item_id and (prev_token or next_token):
         pagination_cols = st.columns([1, 2, 1])
         with pagination_cols[1]:
             col1, col2, col3 = st.columns([1, 1, 1])
             
             with col1:
-                if current_page > 1:
+                if prev_token:
                     if st.button("← Previous"):
-                        # Update query params for the previous page
-                        st.query_params.page = current_page-1
+                        # Carry the opaque keyset token for the previous page
+                        st.query_params["page"] = prev_token
                         st.rerun()
             
             with col2:
-                st.markdown(f"**Page {current_page} of {total_pages}**", unsafe_allow_html=True)
+                st.markdown(f"**Page {current_page}**", unsafe_allow_html=True)
                 
             with col3:
-                if current_page < total_pages:
+                if next_token:
                     if st.button("Next →"):
-                        # Update query params for the next page
-                        st.query_params.page = current_page+1
+                        # Carry the opaque keyset token for the next page
+                        st.query_params["page"] = next_token
                         st.rerun()
 
 def display_item_details(row):
@@ -405,11 +414,11 @@ def display_item_details(row):
     col1, col2 = st.columns([1, 2])
     
     with col1:
-        # Display image if available
-        if row.get('image_data'):
+        # Display the pre-encoded thumbnail, falling back to the original
+        if row.get('has_image'):
             try:
-                image = Image.open(io.BytesIO(row['image_data']))
-                st.image(image, use_container_width=True)
+                image_bytes = get_thumbnail(row['item_id'], "detail") or get_item_image(row['item_id'])
+                st.image(image_bytes, use_container_width=True)
             except Exception:
                 st.warning("Image could not be displayed")
         else:
@@ -486,7 +495,12 @@ def edit_item_form(item_id):
     st.subheader(f"Edit Item {item_id}")
     con = get_connection()
     cur = con.cursor(dictionary=True)
-    cur.execute("SELECT * FROM items WHERE item_id = %s", (item_id,))
+    # Only the form fields; the stored has_image flag keeps the BLOB unread
+    cur.execute("""
+        SELECT title, description, price, condition_status, status, category_id,
+               contact_preference, location, has_image
+        FROM items WHERE item_id = %s
+    """, (item_id,))
     item_data = cur.fetchone()
     cur.close()
 
@@ -497,11 +511,17 @@ def edit_item_form(item_id):
     with st.form(f"edit_item_form_{item_id}"):
         new_title = st.text_input("Title", item_data["title"])
         
-        # Category selection
-        categories = ["Electronics", "Clothing", "Furniture", "Books", "Sports & Outdoors", 
-                      "Home & Kitchen", "Toys & Games", "Beauty & Health", "Other"]
-        default_category_idx = categories.index(item_data["category"]) if item_data.get("category") in categories else 0
-        new_category = st.selectbox("Category", categories, index=default_category_idx)
+        # Category selection from the catalog, keeping "no category" possible
+        catalog = get_category_catalog()
+        category_options = [None] + catalog.tree()
+        current_category_id = item_data.get("category_id")
+        default_category_idx = category_options.index(current_category_id) if current_category_id in catalog else 0
+        new_category_id = st.selectbox(
+            "Category", category_options, index=default_category_idx,
+            format_func=lambda category_id: (
+                "Uncategorized" if category_id is None else catalog.label(category_id, indent="\u00a0" * 4)
+            )
+        )
         
         new_description = st.text_area("Description", item_data["description"])
         
@@ -513,11 +533,10 @@ def edit_item_form(item_id):
         new_condition = st.selectbox("Condition", all_conditions, index=default_idx)
         
         # Image upload (with current image preview if available)
-        if item_data.get('image_data'):
+        if item_data.get('has_image'):
             try:
                 st.write("Current Image:")
-                image = Image.open(io.BytesIO(item_data['image_data']))
-                st.image(image, width=200)
+                st.image(get_thumbnail(item_id, "list") or get_item_image(item_id), width=200)
             except Exception:
                 st.warning("Current image could not be displayed")
         
@@ -554,23 +573,30 @@ def edit_item_form(item_id):
                     update_query = """
                         UPDATE items
                         SET title=%s, description=%s, price=%s, condition_status=%s, 
-                            category=%s, contact_preference=%s, location=%s, status=%s
+                            category_id=%s, contact_preference=%s, location=%s, status=%s,
+                            version=version + 1
                     """
                     params = [new_title, new_description, new_price, new_condition, 
-                             new_category, new_contact, new_location, new_status]
+                             new_category_id, new_contact, new_location, new_status]
                     
                     # Handle image update if a new one is uploaded
-                    if uploaded_file is not None:
+                    new_image = uploaded_file.getvalue() if uploaded_file is not None else None
+                    if new_image is not None:
                         update_query += ", image_data=%s"
-                        params.append(uploaded_file.getvalue())
+                        params.append(new_image)
                     
                     # Complete the query and execute
                     update_query += " WHERE item_id=%s"
                     params.append(item_id)
                     
                     cursor.execute(update_query, params)
+                    
+                    # Regenerate thumbnails in the same transaction
+                    if new_image is not None:
+                        store_thumbnails(cursor, item_id, new_image)
                     conn.commit()
 
+                invalidate(ITEMS)
                 st.success("Item updated successfully!")
                 # Clear the edit form state
                 st.session_state.show_edit_form = False
@@ -586,61 +612,76 @@ def edit_item_form(item_id):
 def delete_item(item_id):
     """Delete an item after confirmation"""
     try:
-        # Use a transaction with SERIALIZABLE isolation to ensure data consistency
-        with transaction(IsolationLevel.SERIALIZABLE) as (conn, cursor):
-            # Check if the item exists and can be deleted
-            cursor.execute("SELECT status FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
-            item = cursor.fetchone()
-            
-            if not item:
-                st.error(f"Item {item_id} not found")
-                return False
-            
-            # Perform the deletion
-            cursor.execute("DELETE FROM items WHERE item_id = %s", (item_id,))
-            
-            if cursor.rowcount > 0:
-                return True
-            else:
-                st.error("Failed to delete item")
-                return False
+        return _delete_item(item_id)
     except Exception as e:
         st.error(f"Error deleting item: {str(e)}")
         return False
 
+@retry_on_conflict()
+def _delete_item(item_id):
+    """Delete an item; re-run from scratch if MySQL reports a deadlock or lock wait timeout"""
+    # Use a transaction with SERIALIZABLE isolation to ensure data consistency
+    with transaction(IsolationLevel.SERIALIZABLE) as (conn, cursor):
+        # Check if the item exists and can be deleted
+        cursor.execute("SELECT status FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
+        item = cursor.fetchone()
+        
+        if not item:
+            st.error(f"Item {item_id} not found")
+            return False
+        
+        # Perform the deletion
+        cursor.execute("DELETE FROM items WHERE item_id = %s", (item_id,))
+        deleted = cursor.rowcount > 0
+    
+    if deleted:
+        invalidate(ITEMS)
+        return True
+    else:
+        st.error("Failed to delete item")
+        return False
+
 def purchase_item(item_id, seller_id, price):
     """Record a purchase transaction when a user buys an item"""
     try:
         # Get the buyer ID (using default user ID 1 for simplicity)
         buyer_id = 1  # In a real app, this would be the logged-in user
-        
-        with transaction(IsolationLevel.SERIALIZABLE) as (conn, cursor):
-            # 1. Check item availability
-            cursor.execute("SELECT status FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
-            item = cursor.fetchone()
-            
-            if not item or item['status'] != 'Available':
-                st.error("This item is no longer available for purchase.")
-                return False
-            
-            # 2. Update item status to Sold
-            cursor.execute("UPDATE items SET status = 'Sold' WHERE item_id = %s", (item_id,))
-            
-            # 3. Create transaction record
-            cursor.execute("""
-                INSERT INTO transactions 
-                (item_id, seller_id, buyer_id, price, payment_method, status)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (item_id, seller_id, buyer_id, price, "Credit Card", "Completed"))
-            
-            transaction_id = cursor.lastrowid
-            
-            return transaction_id
+        return _purchase_item(item_id, seller_id, buyer_id, price)
     except Exception as e:
         st.error(f"Error processing purchase: {str(e)}")
         return False
 
+@retry_on_conflict()
+def _purchase_item(item_id, seller_id, buyer_id, price):
+    """Purchase an item; re-run from scratch if MySQL reports a deadlock or lock wait timeout"""
+    with transaction(IsolationLevel.SERIALIZABLE) as (conn, cursor):
+        # 1. Check item availability
+        cursor.execute("SELECT status FROM items WHERE item_id = %s FOR UPDATE", (item_id,))
+        item = cursor.fetchone()
+        
+        if not item or item['status'] != 'Available':
+            st.error("This item is no longer available for purchase.")
+            return False
+        
+        # 2. Update item status to Sold
+        cursor.execute("UPDATE items SET status = 'Sold', version = version + 1 WHERE item_id = %s", (item_id,))
+        
+        # 3. Create transaction record
+        cursor.execute("""
+            INSERT INTO transactions 
+            (item_id, seller_id, buyer_id, price, payment_method, status)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (item_id, seller_id, buyer_id, price, "Credit Card", "Completed"))
+        
+        transaction_id = cursor.lastrowid
+    
+    invalidate(ITEMS)
+    return transaction_id
+
 def app():
+    if not schema_is_current():
+        st.error("The database schema is out of date. Run `python -m database.migrations` to upgrade it.")
+        st.stop()
     # Initialize session state if not exists
     if 'selected_item' not in st.session_state:
         st.session_state.selected_item = None
@@ -0,0 +1,27 @@
+# secondhand_market/tests/conftest.py
+"""
+Shared fixtures for the database tests.
+
+The tests run against the MySQL database configured through DB_HOST,
+DB_USER, DB_PASSWORD and DB_NAME, migrated with `python -m database.migrations`
+(which also deploys the stored procedures). They are skipped when that
+database is unreachable or its schema is out of date.
+"""
+
+import pytest
+from database.db_setup import get_connection, schema_is_current
+
+@pytest.fixture(scope="session")
+def migrated_database():
+    """Skip the test unless the configured database is reachable and migrated."""
+    if not schema_is_current():
+        pytest.skip("MySQL database unreachable or not migrated (run `python -m database.migrations`)")
+
+@pytest.fixture
+def cursor(migrated_database):
+    """A dictionary cursor on a pooled connection, closed after the test."""
+    conn = get_connection()
+    cur = conn.cursor(dictionary=True)
+    yield cur
+    cur.close()
+    conn.close()
@@ -0,0 +1,64 @@
+# secondhand_market/tests/test_cache.py
+"""
+In-process cache backend and namespace-versioned cache keys.
+"""
+
+import pytest
+from database import cache
+from database.cache import ITEMS, CATEGORIES, LRUCache
+
+@pytest.fixture
+def backend(monkeypatch):
+    """A fresh in-process backend installed as the active cache."""
+    fresh = LRUCache(max_entries=2)
+    monkeypatch.setattr(cache, "_backend", fresh)
+    return fresh
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: clock[0])
+    lru = LRUCache()
+    lru.set("k", "v", ttl=10)
+    clock[0] = 109.9
+    assert lru.get("k") == "v"
+    clock[0] = 110.0
+    assert lru.get("k") is None
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache(max_entries=2)
+    lru.set("a", 1, ttl=60)
+    lru.set("b", 2, ttl=60)
+    lru.get("a")
+    lru.set("c", 3, ttl=60)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+
+def test_make_key_normalizes_whitespace(backend):
+    assert cache.make_key([ITEMS], "SELECT  *\n FROM items", [1]) == cache.make_key([ITEMS], "SELECT * FROM items", [1])
+    assert cache.make_key([ITEMS], "SELECT * FROM items", [1]) != cache.make_key([ITEMS], "SELECT * FROM items", [2])
+
+def test_invalidate_changes_only_dependent_keys(backend):
+    items_key = cache.make_key([ITEMS, CATEGORIES], "SELECT 1")
+    categories_key = cache.make_key([CATEGORIES], "SELECT 1")
+    cache.invalidate(ITEMS)
+    assert cache.make_key([CATEGORIES, ITEMS], "SELECT 1") != items_key
+    assert cache.make_key([CATEGORIES], "SELECT 1") == categories_key
+
+def test_get_or_set_loads_once_until_invalidated(backend):
+    calls = []
+    def loader():
+        calls.append(1)
+        return ["row"]
+
+    for _ in range(2):
+        assert cache.get_or_set(cache.make_key([ITEMS], "SELECT 1"), loader) == ["row"]
+    cache.invalidate(ITEMS)
+    cache.get_or_set(cache.make_key([ITEMS], "SELECT 1"), loader)
+    assert len(calls) == 2
+
+def test_backend_errors_fall_back_to_loader(monkeypatch):
+    class BrokenBackend(LRUCache):
+        def get(self, key):
+            raise ConnectionError("cache down")
+
+    monkeypatch.setattr(cache, "_backend", BrokenBackend())
+    assert cache.get_or_set("key", lambda: 42) == 42
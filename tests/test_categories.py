@@ -0,0 +1,41 @@
+# secondhand_market/tests/test_categories.py
+"""
+Category catalog built from (category_id, name, parent_category_id) rows.
+"""
+
+from database.categories import CategoryCatalog
+
+ROWS = [
+    (1, "Electronics", None),
+    (2, "Phones", 1),
+    (3, "Smartphones", 2),
+    (4, "Audio", 1),
+    (5, "Furniture", None),
+    (6, "Orphan", 99),
+]
+
+def test_descendants_include_the_whole_subtree():
+    catalog = CategoryCatalog(ROWS)
+    assert catalog.descendants(1) == {1, 2, 3, 4}
+    assert catalog.descendants(2) == {2, 3}
+    assert catalog.descendants(3) == {3}
+    assert catalog.descendants(42) == frozenset()
+
+def test_tree_order_and_labels():
+    catalog = CategoryCatalog(ROWS)
+    assert catalog.tree() == [1, 4, 2, 3, 5, 6]
+    assert catalog.label(3, indent="-") == "--Smartphones"
+    assert catalog.names() == sorted(name for _, name, _ in ROWS)
+
+def test_dangling_parent_becomes_root():
+    catalog = CategoryCatalog(ROWS)
+    assert catalog.parent_of(6) is None
+    assert catalog.depth(6) == 0
+    assert catalog.descendants(6) == {6}
+
+def test_parent_cycle_is_listed_flat():
+    catalog = CategoryCatalog([(1, "Root", None), (2, "Loop A", 3), (3, "Loop B", 2)])
+    assert len(catalog) == 3
+    assert set(catalog.tree()) == {1, 2, 3}
+    assert catalog.descendants(2) == {2}
+    assert catalog.id_for("Loop B") == 3 and catalog.name_for(3) == "Loop B"
@@ -0,0 +1,56 @@
+# secondhand_market/tests/test_filters.py
+"""
+WHERE clauses built for the browse page and the transaction history.
+
+Only the filters in use may appear, each as a plain predicate on the raw
+column, with one %s placeholder per parameter.
+"""
+
+import datetime
+import pytest
+from database.item_queries import build_item_filter
+from database.transaction_queries import build_transaction_filter, day_range
+
+DAY = datetime.datetime(2024, 3, 1)
+NEXT_DAY = datetime.datetime(2024, 3, 2)
+
+@pytest.mark.parametrize("filters, expected_sql, expected_params", [
+    ({}, "WHERE 1=1", []),
+    ({"category_id": 0, "condition": "All Conditions", "status": "All"}, "WHERE 1=1", []),
+    ({"category_id": 3}, "WHERE i.category_id = %s", [3]),
+    ({"category_id": {3}}, "WHERE i.category_id = %s", [3]),
+    ({"category_id": set()}, "WHERE 1=1", []),
+    ({"category_id": {9, 3, 5}}, "WHERE i.category_id IN (%s, %s, %s)", [3, 5, 9]),
+    ({"min_price": 10, "max_price": 50}, "WHERE i.price BETWEEN %s AND %s", [10, 50]),
+    ({"min_price": 0}, "WHERE i.price >= %s", [0]),
+    ({"max_price": 50}, "WHERE i.price <= %s", [50]),
+    ({"condition": "New", "status": "Sold"}, "WHERE i.condition_status = %s AND i.status = %s", ["New", "Sold"]),
+    ({"created_from": DAY, "created_before": NEXT_DAY},
+     "WHERE i.created_at >= %s AND i.created_at < %s", [DAY, NEXT_DAY]),
+    ({"category_id": 3, "min_price": 10, "max_price": 50, "condition": "Good"},
+     "WHERE i.category_id = %s AND i.price BETWEEN %s AND %s AND i.condition_status = %s", [3, 10, 50, "Good"]),
+])
+def test_build_item_filter(filters, expected_sql, expected_params):
+    assert build_item_filter(**filters) == (expected_sql, expected_params)
+
+@pytest.mark.parametrize("filters, expected_sql, expected_params", [
+    ({}, "WHERE 1=1", []),
+    ({"seller_id": 0}, "WHERE t.seller_id = %s", [0]),
+    ({"buyer_id": 7, "start": DAY}, "WHERE t.buyer_id = %s AND t.transaction_date >= %s", [7, DAY]),
+    ({"start": DAY, "end_before": NEXT_DAY, "seller_id": 2},
+     "WHERE t.seller_id = %s AND t.transaction_date >= %s AND t.transaction_date < %s", [2, DAY, NEXT_DAY]),
+])
+def test_build_transaction_filter(filters, expected_sql, expected_params):
+    assert build_transaction_filter(**filters) == (expected_sql, expected_params)
+
+def test_placeholders_match_params():
+    where_sql, params = build_item_filter(category_id=[1, 2], min_price=1, condition="New",
+                                          status="Available", created_from=DAY, created_before=NEXT_DAY)
+    assert where_sql.count("%s") == len(params)
+
+def test_day_range_is_half_open():
+    assert day_range(datetime.date(2024, 2, 28), datetime.date(2024, 2, 29)) == (
+        datetime.datetime(2024, 2, 28), datetime.datetime(2024, 3, 1),
+    )
+    assert day_range(None, datetime.date(2024, 12, 31)) == (None, datetime.datetime(2025, 1, 1))
+    assert day_range() == (None, None)
@@ -0,0 +1,131 @@
+# secondhand_market/tests/test_pagination.py
+"""
+Keyset pagination and page tokens.
+
+The seek predicates from keyset_clause() run against an in-memory SQLite
+table, which orders NULLs like MySQL (first ascending, last descending), so
+walking every page must visit each row exactly once in ORDER BY order.
+"""
+
+import datetime
+import decimal
+import sqlite3
+import pytest
+from database.pagination import (
+    AFTER, BEFORE, SORT_ORDERS, decode_page_token, encode_page_token, filter_fingerprint,
+    finish_page, keyset_clause
+)
+
+PAGE_SIZE = 4
+FILTER_KEY = filter_fingerprint("test")
+
+# (item_id, price, title, created_at); several NULL prices and dates, and ties
+ROWS = [
+    (1, None, "lamp", "2024-01-03 10:00:00"),
+    (2, 5, "desk", None),
+    (3, 5, "chair", "2024-01-01 09:00:00"),
+    (4, None, "bike", "2024-01-02 08:00:00"),
+    (5, 12.5, "atlas", "2024-01-03 10:00:00"),
+    (6, 7, "radio", None),
+    (7, None, "kettle", "2024-01-05 12:00:00"),
+    (8, 12.5, "mirror", "2024-01-04 11:00:00"),
+    (9, 3, "guitar", "2024-01-02 08:00:00"),
+    (10, None, "sofa", None),
+    (11, 7, "tent", "2024-01-06 07:00:00"),
+]
+
+@pytest.fixture
+def items():
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute("CREATE TABLE items (item_id INTEGER PRIMARY KEY, price NUMERIC, title TEXT, created_at TEXT)")
+    db.executemany("INSERT INTO items VALUES (?, ?, ?, ?)", ROWS)
+    yield db
+    db.close()
+
+def fetch_page(db, sort_label, position):
+    """Run one page query the way the browse page does (LIMIT page_size + 1)."""
+    where_sql, params, order_sql = keyset_clause(sort_label, position)
+    sql = f"SELECT * FROM items i WHERE 1=1{where_sql} ORDER BY {order_sql} LIMIT ?".replace("%s", "?")
+    rows = [dict(row) for row in db.execute(sql, params + [PAGE_SIZE + 1])]
+    return finish_page(rows, sort_label, FILTER_KEY, position, PAGE_SIZE)
+
+def expected_order(db, sort_label):
+    column, direction = SORT_ORDERS[sort_label]
+    sql = f"SELECT item_id FROM items ORDER BY {column} {direction}, item_id {direction}"
+    return [row[0] for row in db.execute(sql)]
+
+@pytest.mark.parametrize("sort_label", list(SORT_ORDERS))
+def test_forward_pages_visit_every_row_once(items, sort_label):
+    seen, position = [], None
+    for _ in range(len(ROWS)):
+        rows, page, _, next_token = fetch_page(items, sort_label, position)
+        assert page == len(seen) // PAGE_SIZE + 1
+        seen += [row["item_id"] for row in rows]
+        if not next_token:
+            break
+        position = decode_page_token(next_token, sort_label, FILTER_KEY)
+    assert seen == expected_order(items, sort_label)
+
+@pytest.mark.parametrize("sort_label", list(SORT_ORDERS))
+def test_backward_pages_mirror_forward_pages(items, sort_label):
+    forward, position, prev_token = [], None, None
+    while True:
+        rows, _, prev_token, next_token = fetch_page(items, sort_label, position)
+        forward.append([row["item_id"] for row in rows])
+        if not next_token:
+            break
+        position = decode_page_token(next_token, sort_label, FILTER_KEY)
+
+    backward = []
+    while prev_token:
+        position = decode_page_token(prev_token, sort_label, FILTER_KEY)
+        rows, _, prev_token, _ = fetch_page(items, sort_label, position)
+        backward.insert(0, [row["item_id"] for row in rows])
+    assert backward == forward[:-1]
+
+@pytest.mark.parametrize("direction", ["ASC", "DESC"])
+def test_null_boundary_seeks_only_by_item_id(direction):
+    sort_label = "Price: Low to High" if direction == "ASC" else "Price: High to Low"
+    position = {"direction": AFTER, "page": 2, "value": None, "item_id": 7}
+    where_sql, params, _ = keyset_clause(sort_label, position)
+    assert params == [7]
+    assert "i.price IS NULL" in where_sql
+
+def test_descending_seek_keeps_null_rows_reachable():
+    position = {"direction": AFTER, "page": 2, "value": decimal.Decimal("7"), "item_id": 6}
+    where_sql, params, _ = keyset_clause("Price: High to Low", position)
+    assert where_sql.endswith("OR i.price IS NULL)")
+    assert params == [decimal.Decimal("7"), decimal.Decimal("7"), 6]
+
+def test_first_page_has_no_seek():
+    assert keyset_clause("Newest first", None) == ("", [], "i.created_at DESC, i.item_id DESC")
+
+def test_before_position_scans_in_reverse():
+    position = {"direction": BEFORE, "page": 1, "value": "lamp", "item_id": 1}
+    _, _, order_sql = keyset_clause("A-Z", position)
+    assert order_sql == "i.title DESC, i.item_id DESC"
+
+@pytest.mark.parametrize("value", [
+    datetime.datetime(2024, 1, 3, 10, 0), decimal.Decimal("12.50"), "atlas", None,
+])
+def test_page_token_round_trip(value):
+    sort_label = {datetime.datetime: "Newest first", decimal.Decimal: "Price: Low to High"}.get(type(value), "A-Z")
+    column, _ = SORT_ORDERS[sort_label]
+    token = encode_page_token(sort_label, FILTER_KEY, AFTER, 3, row={column: value, "item_id": 5})
+    assert decode_page_token(token, sort_label, FILTER_KEY) == {
+        "direction": AFTER, "page": 3, "value": value, "item_id": 5,
+    }
+
+def test_offset_token_round_trip():
+    token = encode_page_token("Best match", FILTER_KEY, AFTER, 2, offset=20)
+    assert decode_page_token(token, "Best match", FILTER_KEY) == {"direction": AFTER, "page": 2, "offset": 20}
+
+@pytest.mark.parametrize("sort_label, filter_key, token", [
+    ("Z-A", FILTER_KEY, None),
+    ("A-Z", filter_fingerprint("other filters"), None),
+    ("A-Z", FILTER_KEY, "not a token"),
+])
+def test_foreign_or_broken_tokens_restart_at_first_page(sort_label, filter_key, token):
+    token = token or encode_page_token("A-Z", FILTER_KEY, AFTER, 2, row={"title": "lamp", "item_id": 1})
+    assert decode_page_token(token, sort_label, filter_key) is None
@@ -0,0 +1,107 @@
+# secondhand_market/tests/test_query_plans.py
+"""
+EXPLAIN checks that the browse and transaction history filters can use
+their indexes.
+
+Every filter shape is checked twice: as built in Python by
+build_item_filter() / build_transaction_filter(), and as prepared by the
+get_items_by_filter / get_transaction_history procedures, which leave their
+statements in user variables. A check passes when the expected index is
+among the possible keys of the filtered table, i.e. the predicates are
+sargable. Which index the optimizer picks depends on the data; on a handful
+of sample rows MySQL may prefer a full scan.
+"""
+
+import datetime
+import pytest
+from database.item_queries import LISTING_COLUMNS, LISTING_FROM, build_item_filter
+from database.transaction_queries import HISTORY_FROM, build_transaction_filter
+
+END_BEFORE = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+START = END_BEFORE - datetime.timedelta(days=30)
+
+# Rows per page passed to the procedures
+PAGE_SIZE = 26
+
+def explain(cursor, sql, params):
+    """Return the EXPLAIN rows of a query."""
+    cursor.execute(f"EXPLAIN {sql}", params)
+    return cursor.fetchall()
+
+def explain_prepared(cursor, statement_variable, using=None):
+    """Return the EXPLAIN rows of a statement a procedure left in a user variable."""
+    cursor.execute(f"SET @explain_sql = CONCAT('EXPLAIN ', {statement_variable})")
+    cursor.execute("PREPARE explain_stmt FROM @explain_sql")
+    cursor.execute(f"EXECUTE explain_stmt USING {using}" if using else "EXECUTE explain_stmt")
+    plan = cursor.fetchall()
+    cursor.execute("DEALLOCATE PREPARE explain_stmt")
+    return plan
+
+def call_procedure(cursor, name, params):
+    """CALL a procedure and consume every result set."""
+    cursor.execute(f"CALL {name}({', '.join(['%s'] * len(params))})", params)
+    cursor.fetchall()
+    while cursor.nextset():
+        if cursor.description is not None:
+            cursor.fetchall()
+
+def possible_keys(plan, alias):
+    """Return the possible keys of a table alias in an EXPLAIN plan."""
+    rows = [row for row in plan if row["table"] == alias]
+    assert rows, f"no plan row for {alias}: {plan}"
+    return set((rows[0]["possible_keys"] or "").split(","))
+
+def require_index(cursor, table, index):
+    """Skip the test if an index has not been created."""
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index,))
+    if not cursor.fetchall():
+        pytest.skip(f"{table}.{index} does not exist (run create_indexes.py)")
+
+# (filters, expected index on transactions)
+HISTORY_CASES = [
+    ({"start": START, "end_before": END_BEFORE}, "transaction_date_idx"),
+    ({"start": START, "end_before": END_BEFORE, "seller_id": 1}, "transactions_seller_date_idx"),
+    ({"start": START, "end_before": END_BEFORE, "buyer_id": 1}, "transactions_buyer_date_idx"),
+]
+
+@pytest.mark.parametrize("filters, expected_index", HISTORY_CASES)
+def test_transaction_history_query_uses_index(cursor, filters, expected_index):
+    where_sql, params = build_transaction_filter(**filters)
+    sql = f"SELECT t.transaction_id {HISTORY_FROM} {where_sql} ORDER BY t.transaction_date DESC, t.transaction_id DESC"
+    assert expected_index in possible_keys(explain(cursor, sql, params), "t")
+
+@pytest.mark.parametrize("filters, expected_index", HISTORY_CASES)
+def test_transaction_history_procedure_uses_index(cursor, filters, expected_index):
+    call_procedure(cursor, "get_transaction_history", [
+        filters.get("start"), filters.get("end_before"), filters.get("seller_id"), filters.get("buyer_id"),
+        None, None, PAGE_SIZE,
+    ])
+    page_plan = explain_prepared(cursor, "@history_sql", "@history_page_size")
+    assert expected_index in possible_keys(page_plan, "t")
+    totals_plan = explain_prepared(cursor, "@history_totals_sql")
+    assert expected_index in possible_keys(totals_plan, "t")
+
+# (build_item_filter arguments, expected index on items)
+BROWSE_CASES = [
+    ({"status": "Available"}, "status_created_at_idx"),
+    ({"category_id": 1, "min_price": 10, "max_price": 50}, "category_price_condition_idx"),
+    ({"category_id": 1, "min_price": 10, "max_price": 50, "condition": "New"}, "category_price_condition_idx"),
+    ({"created_from": START, "created_before": END_BEFORE}, "created_at_idx"),
+]
+
+@pytest.mark.parametrize("filters, expected_index", BROWSE_CASES)
+def test_browse_query_uses_index(cursor, filters, expected_index):
+    require_index(cursor, "items", expected_index)
+    where_sql, params = build_item_filter(**filters)
+    sql = f"SELECT {LISTING_COLUMNS} {LISTING_FROM} {where_sql} ORDER BY i.created_at DESC, i.item_id DESC LIMIT {PAGE_SIZE}"
+    assert expected_index in possible_keys(explain(cursor, sql, params), "i")
+
+# Date filters are not procedure parameters; the page uses the ad-hoc query for them
+@pytest.mark.parametrize("filters, expected_index", [case for case in BROWSE_CASES if "created_from" not in case[0]])
+def test_browse_procedure_uses_index(cursor, filters, expected_index):
+    require_index(cursor, "items", expected_index)
+    call_procedure(cursor, "get_items_by_filter", [
+        filters.get("category_id"), filters.get("min_price"), filters.get("max_price"),
+        filters.get("condition"), filters.get("status"), "created_at", "DESC", None, None, PAGE_SIZE,
+    ])
+    assert expected_index in possible_keys(explain_prepared(cursor, "@sql", "@page_size"), "i")
@@ -0,0 +1,34 @@
+# secondhand_market/tests/test_search.py
+"""
+Full-text search terms built from user input.
+"""
+
+import pytest
+from database.search import build_boolean_query, search_predicate, tokenize
+
+@pytest.mark.parametrize("text, expected", [
+    ("Nintendo Switch", ["nintendo", "switch"]),
+    ("the lamp for a desk", ["lamp", "desk"]),
+    ("+bike -red* \"road\"", ["bike", "red", "road"]),
+    ("tv dvd DVD dvd", ["dvd"]),
+    ("", []),
+    (None, []),
+])
+def test_tokenize(text, expected):
+    assert tokenize(text) == expected
+
+def test_build_boolean_query_requires_every_prefix():
+    assert build_boolean_query("nintendo swit") == "+nintendo* +swit*"
+
+@pytest.mark.parametrize("text", ["tv", "of the", "  "])
+def test_build_boolean_query_without_tokens(text):
+    assert build_boolean_query(text) is None
+
+def test_search_predicate_uses_match():
+    where_sql, where_params, order_sql, order_params = search_predicate("road bike")
+    assert "MATCH(i.title, i.description)" in where_sql
+    assert where_params == order_params == ["+road* +bike*"]
+    assert order_sql.endswith("DESC")
+
+def test_search_predicate_falls_back_to_escaped_prefix_like():
+    assert search_predicate(" 5%_\\ ") == (" AND i.title LIKE %s", ["5\\%\\_\\\\%"], None, [])
@@ -0,0 +1,24 @@
+# secondhand_market/tests/test_transaction_manager.py
+"""
+Retry classification and backoff for conflicting transactions.
+"""
+
+import mysql.connector
+import pytest
+from database.transaction_manager import classify_error, retry_delay
+
+@pytest.mark.parametrize("error, expected", [
+    (mysql.connector.errors.InternalError(errno=1213), "deadlock"),
+    (mysql.connector.errors.DatabaseError(errno=1205), "lock_wait_timeout"),
+    (mysql.connector.errors.IntegrityError(errno=1062), None),
+    (ValueError("not a database error"), None),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+@pytest.mark.parametrize("attempt, ceiling", [(1, 0.05), (2, 0.1), (3, 0.2), (10, 1.0)])
+def test_retry_delay_is_capped_full_jitter(monkeypatch, attempt, ceiling):
+    monkeypatch.setattr("random.uniform", lambda low, high: (low, high))
+    low, high = retry_delay(attempt, base_delay=0.05, max_delay=1.0)
+    assert low == 0
+    assert high == pytest.approx(ceiling)